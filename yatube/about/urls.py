@@ -1,11 +1,14 @@
 from django.urls import path
 
+from core.decorators import page_cache
 from . import views
 
 app_name = 'about'
 
 urlpatterns = [
-    path('author/', views.AboutAuthorView.as_view(), name='author'),
-    path('tech/', views.AboutTechView.as_view(), name='tech'),
+    path(
+        'author/', page_cache(views.AboutAuthorView.as_view()), name='author'
+    ),
+    path('tech/', page_cache(views.AboutTechView.as_view()), name='tech'),
 
 ]
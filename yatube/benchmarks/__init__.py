@@ -0,0 +1,11 @@
+"""Нагрузочные замеры горячих представлений yatube.
+
+Запуск из каталога с manage.py:
+
+    python -m benchmarks --workers 8 --requests 200 --output run.json
+
+WSGI-приложение вызывается в том же процессе из нескольких потоков
+против отдельной засеянной базы (benchmarks.settings). Перцентили
+считаются по успешным ответам; если хоть один ответ неожиданный,
+прогон завершается с кодом 1.
+"""
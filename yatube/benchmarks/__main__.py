@@ -0,0 +1,96 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Замер горячих представлений yatube.',
+    )
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=100,
+                        help='запросов на сценарий')
+    parser.add_argument('--scenario', action='append', dest='scenarios',
+                        help='сценарий (можно несколько), по умолчанию все')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--reseed', action='store_true',
+                        help='пересоздать базу замеров')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--comments', type=int, default=20000)
+    parser.add_argument('--output', help='файл для JSON, иначе stdout')
+    options = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.core.management import call_command
+
+    from . import runner, seed
+    from .scenarios import SCENARIOS
+    from posts.models import Post
+
+    database = settings.DATABASES['default']['NAME']
+    if options.reseed and os.path.exists(database):
+        os.remove(database)
+    call_command('migrate', verbosity=0)
+    if not Post.objects.exists():
+        seed.populate(
+            options.seed, stdout=sys.stderr, users=options.users,
+            posts=options.posts, comments=options.comments,
+        )
+    scenarios = {
+        name: SCENARIOS[name]
+        for name in options.scenarios or SCENARIOS
+    }
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'started': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'workers': options.workers,
+            'requests': options.requests,
+            'seed': options.seed,
+            'posts': Post.objects.count(),
+        },
+        'scenarios': runner.run(
+            scenarios, seed.context(), options.requests, options.workers,
+            options.seed,
+        ),
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if options.output:
+        with open(options.output, 'w') as file:
+            file.write(text + '\n')
+    else:
+        print(text)
+    failed = {
+        name: result['error_statuses']
+        for name, result in report['scenarios'].items() if result['errors']
+    }
+    if failed:
+        print(f'Неожиданные ответы: {failed}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,189 @@
+import math
+import random
+import statistics
+import sys
+import threading
+import time
+from importlib import import_module
+from io import BytesIO
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY)
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, connections
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.utils.crypto import get_random_string
+
+from core.decorators import QueryCounter
+
+CSRF_TOKEN = get_random_string(64)
+
+
+class Sessions:
+    """Cookie вошедших пользователей, по одной сессии на пользователя."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.keys = {}
+
+    def cookie(self, user):
+        cookie = f'{settings.CSRF_COOKIE_NAME}={CSRF_TOKEN}'
+        if user is None:
+            return cookie
+        with self.lock:
+            if user.pk not in self.keys:
+                engine = import_module(settings.SESSION_ENGINE)
+                session = engine.SessionStore()
+                session[SESSION_KEY] = str(user.pk)
+                session[BACKEND_SESSION_KEY] = (
+                    'django.contrib.auth.backends.ModelBackend'
+                )
+                session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+                session.save()
+                self.keys[user.pk] = session.session_key
+        return f'{cookie}; {settings.SESSION_COOKIE_NAME}={self.keys[user.pk]}'
+
+
+def environ_for(request, cookie):
+    body = b''
+    environ = {
+        'REQUEST_METHOD': request.method,
+        'PATH_INFO': request.path,
+        'QUERY_STRING': request.query,
+        'HTTP_COOKIE': cookie,
+        'HTTP_X_CSRFTOKEN': CSRF_TOKEN,
+        'wsgi.multithread': True,
+    }
+    if request.data is not None:
+        body = encode_multipart(BOUNDARY, request.data)
+        environ['CONTENT_TYPE'] = MULTIPART_CONTENT
+    environ['CONTENT_LENGTH'] = str(len(body))
+    environ['wsgi.input'] = BytesIO(body)
+    environ['wsgi.errors'] = sys.stderr
+    setup_testing_defaults(environ)
+    return environ
+
+
+def call(application, request, sessions):
+    """Один запрос: (секунды, SQL-запросов, код ответа или None).
+
+    Вместо кода None, если он совпал с ожидаемым.
+    """
+    environ = environ_for(request, sessions.cookie(request.user))
+    statuses = []
+
+    def start_response(status, headers, exc_info=None):
+        statuses.append(int(status.split()[0]))
+
+    counter = QueryCounter()
+    started = time.perf_counter()
+    with connection.execute_wrapper(counter):
+        result = application(environ, start_response)
+        try:
+            for _ in result:
+                pass
+        finally:
+            result.close()
+    elapsed = time.perf_counter() - started
+    status = statuses[0]
+    return elapsed, counter.count, None if status == request.expect else status
+
+
+def percentile(values, share):
+    """Ближайший ранг по отсортированному списку."""
+    return values[max(math.ceil(share * len(values)), 1) - 1]
+
+
+def summarize(samples, wall):
+    """Сводка сценария; задержки и запросы - только по успешным ответам.
+
+    Неожиданные коды считаются отдельно в errors и error_statuses:
+    быстрые 500 иначе занижали бы перцентили.
+    """
+    ok = [sample for sample in samples if sample[2] is None]
+    error_statuses = {}
+    for sample in samples:
+        if sample[2] is not None:
+            error_statuses[sample[2]] = error_statuses.get(sample[2], 0) + 1
+    report = {
+        'requests': len(samples),
+        'errors': len(samples) - len(ok),
+        'error_statuses': error_statuses,
+        'throughput_rps': round(len(ok) / wall, 2) if wall else None,
+        'latency_ms': None,
+        'queries_per_request': None,
+    }
+    if not ok:
+        return report
+    latencies = sorted(sample[0] * 1000 for sample in ok)
+    queries = [sample[1] for sample in ok]
+    report['latency_ms'] = {
+        'p50': round(percentile(latencies, 0.50), 3),
+        'p95': round(percentile(latencies, 0.95), 3),
+        'p99': round(percentile(latencies, 0.99), 3),
+        'mean': round(statistics.mean(latencies), 3),
+        'max': round(latencies[-1], 3),
+    }
+    report['queries_per_request'] = {
+        'mean': round(statistics.mean(queries), 2),
+        'max': max(queries),
+    }
+    return report
+
+
+def run_scenario(application, name, build, context, requests, workers,
+                 seed=0, sessions=None):
+    """Прогоняет requests запросов сценария в workers потоков.
+
+    При workers=1 запросы идут в текущем потоке (и его соединении с БД).
+    """
+    sessions = sessions or Sessions()
+    samples = []
+    lock = threading.Lock()
+    tickets = iter(range(requests))
+
+    def worker(number):
+        rng = random.Random(f'{seed}-{name}-{number}')
+        while True:
+            with lock:
+                if next(tickets, None) is None:
+                    return
+            sample = call(application, build(context, rng), sessions)
+            with lock:
+                samples.append(sample)
+
+    def threaded(number):
+        try:
+            worker(number)
+        finally:
+            connections.close_all()
+
+    cache.clear()
+    started = time.perf_counter()
+    if workers == 1:
+        worker(0)
+    else:
+        threads = [
+            threading.Thread(target=threaded, args=(number,))
+            for number in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return summarize(samples, time.perf_counter() - started)
+
+
+def run(scenarios, context, requests=100, workers=4, seed=0):
+    application = WSGIHandler()
+    sessions = Sessions()
+    return {
+        name: run_scenario(
+            application, name, build, context, requests, workers,
+            seed, sessions,
+        )
+        for name, build in scenarios.items()
+    }
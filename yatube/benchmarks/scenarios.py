@@ -0,0 +1,82 @@
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+class Request:
+    def __init__(self, path, method='GET', query='', data=None,
+                 user=None, expect=200):
+        self.path = path
+        self.method = method
+        self.query = query
+        self.data = data
+        self.user = user
+        self.expect = expect
+
+
+def index(context, rng):
+    return Request(
+        reverse('posts:index'), query=f'page={rng.randint(1, 5)}'
+    )
+
+
+def deep_paging(context, rng):
+    page = context['deep_page'] - rng.randint(0, 5)
+    return Request(reverse('posts:index'), query=f'page={max(page, 1)}')
+
+
+def profile(context, rng):
+    return Request(reverse('posts:profile', args=(context['top_author'],)))
+
+
+def post_detail(context, rng):
+    return Request(reverse('posts:post_detail', args=(context['hot_post'],)))
+
+
+def follow_feed(context, rng):
+    return Request(reverse('posts:follow_index'), user=context['reader'])
+
+
+def add_comment(context, rng):
+    return Request(
+        reverse('posts:add_comment', args=(context['hot_post'],)),
+        method='POST',
+        data={'text': f'Комментарий {rng.random()}'},
+        user=context['reader'],
+        expect=302,
+    )
+
+
+def image_upload(context, rng):
+    return Request(
+        reverse('posts:post_create'),
+        method='POST',
+        data={
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(
+                f'bench-{rng.getrandbits(64):x}.gif', SMALL_GIF,
+                content_type='image/gif',
+            ),
+        },
+        user=context['reader'],
+        expect=302,
+    )
+
+
+SCENARIOS = {
+    'index': index,
+    'deep_paging': deep_paging,
+    'profile': profile,
+    'post_detail': post_detail,
+    'follow_feed': follow_feed,
+    'add_comment': add_comment,
+    'image_upload': image_upload,
+}
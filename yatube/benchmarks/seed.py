@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+
+from posts.models import Post, UserStats
+
+User = get_user_model()
+
+
+def populate(seed=0, stdout=None, **sizes):
+    """Засевает базу замеров через manage.py seed_bench."""
+    call_command('seed_bench', seed=seed, stdout=stdout, **sizes)
+
+
+def context():
+    """Параметры сценариев по счётчикам засеянной базы."""
+    stats = UserStats.objects.select_related('user')
+    reader = stats.order_by('-following_count', 'pk').first().user
+    top_author = stats.order_by('-posts_count', 'pk').first().user
+    hot_post = Post.objects.order_by('-comments_count', 'pk').values_list(
+        'pk', flat=True
+    ).first()
+    pages = Post.objects.count() // settings.COUNTLIST + 1
+    return {
+        'hot_post': hot_post,
+        'top_author': top_author.username,
+        'reader': reader,
+        'deep_page': pages,
+        'pages': pages,
+    }
@@ -0,0 +1,36 @@
+import os
+
+from yatube.settings import *  # noqa: F401,F403
+from yatube.settings import BASE_DIR, CACHES, MIDDLEWARE
+
+DEBUG = False
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'core.sqlite3',
+        'NAME': os.environ.get(
+            'BENCH_DB', os.path.join(BASE_DIR, 'bench.sqlite3')
+        ),
+        # потоки пишут комментарии и посты одновременно
+        'OPTIONS': {'timeout': 30},
+    }
+}
+
+CACHES = {
+    **CACHES,
+    'shared': {
+        **CACHES['shared'],
+        'LOCATION': os.environ.get(
+            'BENCH_CACHE', os.path.join(BASE_DIR, 'bench_cache.sqlite3')
+        ),
+    }
+}
+
+MEDIA_ROOT = os.environ.get(
+    'BENCH_MEDIA_ROOT', os.path.join(BASE_DIR, 'bench_media')
+)
+
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if not middleware.startswith('debug_toolbar')
+]
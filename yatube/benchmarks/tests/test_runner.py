@@ -0,0 +1,115 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from posts.models import Comment, Post
+
+from .. import seed
+from ..runner import percentile, run_scenario, summarize
+from ..scenarios import SCENARIOS
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class RunnerTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        seed.populate(
+            users=10, groups=2, posts=40, comments=15, follows=3,
+            stdout=StringIO(),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_seed_reproducible_shape(self):
+        context = seed.context()
+        self.assertEqual(Post.objects.count(), 40)
+        self.assertEqual(Comment.objects.count(), 15)
+        self.assertEqual(
+            Comment.objects.filter(post_id=context['hot_post']).count(),
+            Post.objects.get(pk=context['hot_post']).comments_count,
+        )
+        self.assertGreater(context['reader'].follower.count(), 0)
+
+    def test_all_scenarios_succeed(self):
+        application = WSGIHandler()
+        context = seed.context()
+        for name, build in SCENARIOS.items():
+            with self.subTest(scenario=name):
+                report = run_scenario(
+                    application, name, build, context, requests=3, workers=1
+                )
+                self.assertEqual(report['requests'], 3)
+                self.assertEqual(report['errors'], 0)
+                self.assertGreater(report['queries_per_request']['max'], 0)
+                self.assertLessEqual(
+                    report['latency_ms']['p50'], report['latency_ms']['p99']
+                )
+
+    def test_errors_excluded_from_latency(self):
+        samples = [(0.2, 3, None), (0.3, 3, None), (0.001, 1, 500)]
+        report = summarize(samples, 1.0)
+        self.assertEqual(report['errors'], 1)
+        self.assertEqual(report['error_statuses'], {500: 1})
+        self.assertEqual(report['latency_ms']['p50'], 200.0)
+        self.assertEqual(report['queries_per_request']['max'], 3)
+        report = summarize([(0.001, 1, 500)], 1.0)
+        self.assertIsNone(report['latency_ms'])
+
+    def test_percentile_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.95), 95)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([7], 0.99), 7)
+
+
+class ConcurrentRunTest(SimpleTestCase):
+    """Пишущие сценарии в несколько потоков на настоящей файловой базе.
+
+    Тестовая база в памяти не годится: потоки видят разные соединения,
+    а блокировки SQLite проявляются только на файле.
+    """
+    WRITE_SCENARIOS = ('add_comment', 'image_upload')
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_write_scenarios_without_errors(self):
+        environ = {
+            **os.environ,
+            'BENCH_DB': os.path.join(self.directory, 'bench.sqlite3'),
+            'BENCH_CACHE': os.path.join(self.directory, 'cache.sqlite3'),
+            'BENCH_MEDIA_ROOT': os.path.join(self.directory, 'media'),
+        }
+        environ.pop('DJANGO_SETTINGS_MODULE', None)
+        arguments = [
+            sys.executable, '-m', 'benchmarks', '--workers', '4',
+            '--requests', '40', '--users', '20', '--posts', '100',
+            '--comments', '50',
+        ]
+        for name in self.WRITE_SCENARIOS:
+            arguments += ['--scenario', name]
+        finished = subprocess.run(
+            arguments, cwd=settings.BASE_DIR, env=environ,
+            capture_output=True, text=True, timeout=300,
+        )
+        self.assertEqual(finished.returncode, 0, finished.stderr)
+        report = json.loads(finished.stdout)
+        for name in self.WRITE_SCENARIOS:
+            with self.subTest(scenario=name):
+                self.assertEqual(report['scenarios'][name]['errors'], 0)
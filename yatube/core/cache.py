@@ -0,0 +1,495 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.signals import request_started
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB, expires REAL, accessed REAL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+)
+# SQLite ограничивает число параметров запроса
+CHUNK = 500
+# INTEGER в SQLite - знаковое 64-битное; большие int идут через pickle
+MIN_INTEGER = -2 ** 63
+MAX_INTEGER = 2 ** 63 - 1
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite в режиме WAL, общий для процессов одного хоста.
+
+    Читатели WAL не блокируют друг друга и писателя. Целые числа хранятся
+    как INTEGER, поэтому incr атомарен одним UPDATE. Вытеснение - LRU
+    по времени доступа, которое обновляется не чаще ACCESS_RESOLUTION
+    секунд на ключ, чтобы чтения почти не писали. Раз в CULL_EVERY
+    записей процесса лишнее сверх MAX_ENTRIES удаляется.
+
+        CACHES = {'default': {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }}
+    """
+    ACCESS_RESOLUTION = 10
+    CULL_EVERY = 64
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        self.local = threading.local()
+        self.writes = 0
+
+    @property
+    def db(self):
+        # соединение на поток и на процесс: после fork открываем заново
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None,
+                check_same_thread=False,
+            )
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                conn.execute(statement)
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def validate_key(self, key):
+        # ограничения memcached здесь не действуют
+        pass
+
+    @staticmethod
+    def _dump(value):
+        if type(value) is int and MIN_INTEGER <= value <= MAX_INTEGER:
+            return value
+        return sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    @staticmethod
+    def _load(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def _touch_stale(self, keys, now):
+        stale = now - self.ACCESS_RESOLUTION
+        for start in range(0, len(keys), CHUNK):
+            chunk = keys[start:start + CHUNK]
+            marks = ','.join('?' * len(chunk))
+            self.db.execute(
+                f'UPDATE cache SET accessed = ? WHERE key IN ({marks}) '
+                f'AND accessed < ?', (now, *chunk, stale)
+            )
+
+    def _fetch(self, keys):
+        now = time.time()
+        found = {}
+        stale = []
+        for start in range(0, len(keys), CHUNK):
+            chunk = keys[start:start + CHUNK]
+            marks = ','.join('?' * len(chunk))
+            rows = self.db.execute(
+                f'SELECT key, value, expires, accessed FROM cache '
+                f'WHERE key IN ({marks})', chunk
+            )
+            for key, value, expires, accessed in rows:
+                if expires is not None and expires <= now:
+                    continue
+                found[key] = self._load(value)
+                if accessed < now - self.ACCESS_RESOLUTION:
+                    stale.append(key)
+        if stale:
+            self._touch_stale(stale, now)
+        return found
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version)
+        return self._fetch([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        mapping = {self.make_key(key, version): key for key in keys}
+        return {
+            mapping[key]: value
+            for key, value in self._fetch(list(mapping)).items()
+        }
+
+    def _write(self, rows):
+        self.db.executemany(
+            'INSERT INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+            'value = excluded.value, expires = excluded.expires, '
+            'accessed = excluded.accessed', rows
+        )
+        self._maybe_cull(len(rows))
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write([(
+            self.make_key(key, version), self._dump(value),
+            self._expires(timeout), time.time()
+        )])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        expires = self._expires(timeout)
+        rows = [
+            (self.make_key(key, version), self._dump(value), expires, now)
+            for key, value in data.items()
+        ]
+        db = self.db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            self._write(rows)
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        cursor = self.db.execute(
+            'INSERT INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+            'value = excluded.value, expires = excluded.expires, '
+            'accessed = excluded.accessed '
+            'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            (self.make_key(key, version), self._dump(value),
+             self._expires(timeout), now, now)
+        )
+        if cursor.rowcount:
+            self._maybe_cull(1)
+        return bool(cursor.rowcount)
+
+    def incr(self, key, delta=1, version=None):
+        row = self.db.execute(
+            'UPDATE cache SET value = value + ? WHERE key = ? '
+            "AND typeof(value) = 'integer' "
+            'AND (expires IS NULL OR expires > ?) RETURNING value',
+            (delta, self.make_key(key, version), time.time())
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"Key '{key}' not found")
+        return row[0]
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self.db.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self._expires(timeout), self.make_key(key, version), time.time())
+        )
+        return bool(cursor.rowcount)
+
+    def has_key(self, key, version=None):
+        row = self.db.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.make_key(key, version), time.time())
+        ).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        self.db.execute(
+            'DELETE FROM cache WHERE key = ?', (self.make_key(key, version),)
+        )
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version) for key in keys]
+        for start in range(0, len(keys), CHUNK):
+            chunk = keys[start:start + CHUNK]
+            marks = ','.join('?' * len(chunk))
+            self.db.execute(
+                f'DELETE FROM cache WHERE key IN ({marks})', chunk
+            )
+
+    def clear(self):
+        self.db.execute('DELETE FROM cache')
+
+    def _maybe_cull(self, written):
+        self.writes += written
+        if self.writes < self.CULL_EVERY:
+            return
+        self.writes = 0
+        self.cull()
+
+    def cull(self):
+        """Удаляет просроченное, а сверх MAX_ENTRIES - давно не читанное."""
+        db = self.db
+        db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        # как у встроенных бэкендов: срезаем 1/CULL_FREQUENCY записей
+        excess = count - self._max_entries
+        if self._cull_frequency:
+            excess = max(excess, count // self._cull_frequency)
+        db.execute(
+            'DELETE FROM cache WHERE key IN ('
+            'SELECT key FROM cache ORDER BY accessed LIMIT ?)', (excess,)
+        )
+
+    def close(self, **kwargs):
+        # соединение живёт весь поток: открывать файл на каждый запрос дорого
+        pass
+
+
+# значения этих типов неизменяемы, их можно отдавать из памяти как есть
+IMMUTABLE = (str, bytes, int, float, bool, type(None))
+SEQ_KEY = 'tiered:seq'
+LOG_SIZE = 256
+
+
+def _log_key(number):
+    return f'tiered:log:{number % LOG_SIZE}'
+
+
+class LocalStore:
+    """LRU процесса: ключ -> (истекает, замороженное значение)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = OrderedDict()
+        self.seq = 0
+        self.synced = 0.0
+
+    def get(self, key, now):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return entry
+
+    def put(self, key, entry, size):
+        with self.lock:
+            self.data[key] = entry
+            self.data.move_to_end(key)
+            while len(self.data) > size:
+                self.data.popitem(last=False)
+
+    def drop(self, keys):
+        with self.lock:
+            for key in keys:
+                self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+_stores = {}
+
+
+def _force_sync(**kwargs):
+    # каждый запрос сначала сверяется с журналом инвалидаций
+    for store in _stores.values():
+        store.synced = 0.0
+
+
+request_started.connect(_force_sync)
+
+
+class TieredCache(BaseCache):
+    """Небольшой LRU в памяти процесса перед общим кэшем.
+
+    Прочитанное из общего яруса SHARED живёт локально не дольше
+    LOCAL_TIMEOUT секунд, ключей не больше LOCAL_MAX_ENTRIES. Каждая
+    запись через этот бэкенд добавляет изменённые ключи в кольцевой журнал
+    в общем кэше и увеличивает счётчик tiered:seq. Остальные процессы
+    в начале запроса и не реже SYNC_INTERVAL секунд читают счётчик и
+    выбрасывают из памяти перечисленные ключи; если журнал уже перезаписан,
+    память очищается целиком.
+
+        CACHES = {
+            'default': {
+                'BACKEND': 'core.cache.TieredCache',
+                'OPTIONS': {'SHARED': 'shared', 'LOCAL_MAX_ENTRIES': 1000},
+            },
+            'shared': {'BACKEND': 'core.cache.SQLiteCache', ...},
+        }
+    """
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options.get('SHARED', 'shared')
+        self.local_size = int(options.get('LOCAL_MAX_ENTRIES', 1000))
+        self.local_timeout = float(options.get('LOCAL_TIMEOUT', 5))
+        self.sync_interval = float(options.get('SYNC_INTERVAL', 1))
+        self.store = _stores.setdefault(name, LocalStore())
+
+    @property
+    def shared(self):
+        from django.core.cache import caches
+
+        return caches[self.shared_alias]
+
+    def make_key(self, key, version=None):
+        return self.shared.make_key(key, version)
+
+    def validate_key(self, key):
+        self.shared.validate_key(key)
+
+    # журнал инвалидаций
+
+    def sync(self, force=False):
+        store = self.store
+        now = time.monotonic()
+        if not force and now - store.synced < self.sync_interval:
+            return
+        store.synced = now
+        seq = self.shared.get(SEQ_KEY, 0)
+        if seq == store.seq:
+            return
+        if seq < store.seq or seq - store.seq > LOG_SIZE:
+            store.clear()
+        else:
+            numbers = range(store.seq + 1, seq + 1)
+            entries = self.shared.get_many([_log_key(n) for n in numbers])
+            for number in numbers:
+                entry = entries.get(_log_key(number))
+                # запись ещё не дописана или уже перезаписана
+                if entry is None or entry[0] != number or entry[1] is None:
+                    store.clear()
+                    break
+                store.drop(entry[1])
+        store.seq = seq
+
+    def broadcast(self, keys):
+        shared = self.shared
+        try:
+            number = shared.incr(SEQ_KEY)
+        except ValueError:
+            # после очистки или вытеснения счётчик начинается заново со
+            # времени: он опережает прежний больше чем на LOG_SIZE, и все
+            # процессы очистят память целиком
+            shared.add(SEQ_KEY, time.time_ns(), None)
+            number = shared.incr(SEQ_KEY)
+        shared.set(_log_key(number), (number, keys), None)
+        store = self.store
+        if store.seq == number - 1:
+            store.seq = number
+
+    # локальный ярус
+
+    def _local_expires(self, timeout):
+        local = self.local_timeout
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            local = min(local, timeout)
+        return time.monotonic() + local if local > 0 else None
+
+    def _remember(self, key, value, expires):
+        if expires is None:
+            return
+        if isinstance(value, IMMUTABLE):
+            entry = (expires, False, value)
+        else:
+            entry = (expires, True, pickle.dumps(
+                value, pickle.HIGHEST_PROTOCOL
+            ))
+        self.store.put(key, entry, self.local_size)
+
+    def _recall(self, key):
+        entry = self.store.get(key, time.monotonic())
+        if entry is None:
+            return None
+        _, frozen, value = entry
+        return (pickle.loads(value) if frozen else value,)
+
+    # API кэша
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        self.sync()
+        found = {}
+        missing = {}
+        for key in keys:
+            full_key = self.make_key(key, version)
+            hit = self._recall(full_key)
+            if hit is None:
+                missing[full_key] = key
+            else:
+                found[key] = hit[0]
+        if missing:
+            expires = self._local_expires(DEFAULT_TIMEOUT)
+            fetched = self.shared.get_many(missing.values(), version)
+            for full_key, key in missing.items():
+                if key in fetched:
+                    self._remember(full_key, fetched[key], expires)
+                    found[key] = fetched[key]
+        return found
+
+    def has_key(self, key, version=None):
+        self.sync()
+        if self._recall(self.make_key(key, version)) is not None:
+            return True
+        return self.shared.has_key(key, version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version)
+        keys = [self.make_key(key, version) for key in data]
+        self.store.drop(keys)
+        self.broadcast(keys)
+        expires = self._local_expires(timeout)
+        for key, value in data.items():
+            if key not in failed:
+                self._remember(self.make_key(key, version), value, expires)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if not self.shared.add(key, value, timeout, version):
+            return False
+        full_key = self.make_key(key, version)
+        self.store.drop([full_key])
+        self.broadcast([full_key])
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version)
+        self._forget([key], version)
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        touched = self.shared.touch(key, timeout, version)
+        self._forget([key], version)
+        return touched
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        self.shared.delete_many(keys, version)
+        self._forget(keys, version)
+
+    def _forget(self, keys, version):
+        keys = [self.make_key(key, version) for key in keys]
+        self.store.drop(keys)
+        self.broadcast(keys)
+
+    def clear(self):
+        self.shared.clear()
+        self.store.clear()
+        self.broadcast(None)
+
+    def close(self, **kwargs):
+        pass
@@ -0,0 +1,57 @@
+import functools
+import logging
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def query_budget(limit):
+    """Ограничивает число SQL-запросов, выполняемых представлением.
+
+    При превышении пишет предупреждение в лог, а при
+    QUERY_BUDGET_RAISE = True выбрасывает QueryBudgetExceeded.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                response = view(request, *args, **kwargs)
+            if counter.count > limit:
+                message = (
+                    f'{view.__module__}.{view.__name__} выполнил '
+                    f'{counter.count} запросов при бюджете {limit} '
+                    f'({request.path})'
+                )
+                if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+            return response
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
+
+
+def page_cache(view):
+    """Разрешает полностраничный кэш гостей (PageCacheMiddleware).
+
+    Страница сбрасывается по смене значений request.cache_dependencies,
+    а без них живёт PAGE_CACHE_TIMEOUT секунд.
+    """
+    view.page_cache = True
+    return view
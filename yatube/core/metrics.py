@@ -0,0 +1,246 @@
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576)
+
+HISTOGRAMS = {
+    'yatube_request_duration_seconds': (
+        'Время обработки запроса', DURATION_BUCKETS
+    ),
+    'yatube_db_queries': ('SQL-запросов на запрос', QUERY_BUCKETS),
+    'yatube_db_duration_seconds': (
+        'Время в базе данных на запрос', DURATION_BUCKETS
+    ),
+    'yatube_template_duration_seconds': (
+        'Время рендеринга шаблонов на запрос', DURATION_BUCKETS
+    ),
+    'yatube_response_size_bytes': ('Размер ответа', SIZE_BUCKETS),
+}
+RESPONSES = 'yatube_responses_total'
+
+_local = threading.local()
+
+
+class RequestStats:
+    """Счётчики одного запроса, копятся обёртками БД и шаблонов."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+
+
+def current_stats():
+    return getattr(_local, 'stats', None)
+
+
+def set_current_stats(stats):
+    _local.stats = stats
+
+
+def instrument_templates():
+    """Оборачивает Template.render: учитывается только внешний рендер."""
+    from django.template.base import Template
+
+    if getattr(Template.render, 'instrumented', False):
+        return
+    original = Template.render
+
+    def render(self, context):
+        stats = current_stats()
+        if stats is None:
+            return original(self, context)
+        stats.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return original(self, context)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:
+                stats.template_time += time.perf_counter() - started
+
+    render.instrumented = True
+    Template.render = render
+
+
+def _alive(path):
+    """Жив ли процесс, записавший снимок metrics-<pid>.json."""
+    try:
+        pid = int(os.path.basename(path)[len('metrics-'):-len('.json')])
+    except ValueError:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # процесс есть, но принадлежит другому пользователю
+        return True
+    return True
+
+
+def _snapshots(directory):
+    """Снимки живых процессов; файлы завершившихся удаляются."""
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+        if not _alive(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path) as file:
+                yield json.load(file)
+        except (OSError, ValueError):
+            continue
+
+
+class Registry:
+    """Гистограммы процесса.
+
+    При заданном METRICS_DIR каждый процесс периодически сбрасывает
+    снимок в свой файл, а эндпоинт суммирует файлы всех воркеров.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.flushed = 0.0
+
+    def observe(self, name, view, value):
+        buckets = HISTOGRAMS[name][1]
+        with self.lock:
+            data = self.histograms.setdefault(
+                f'{name}|{view}', [0] * len(buckets) + [0.0, 0]
+            )
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    data[index] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def inc(self, name, view, status):
+        with self.lock:
+            key = f'{name}|{view}|{status}'
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def record(self, view, status, duration, stats, size):
+        self.observe('yatube_request_duration_seconds', view, duration)
+        self.observe('yatube_db_queries', view, stats.queries)
+        self.observe('yatube_db_duration_seconds', view, stats.db_time)
+        self.observe(
+            'yatube_template_duration_seconds', view, stats.template_time
+        )
+        if size is not None:
+            self.observe('yatube_response_size_bytes', view, size)
+        self.inc(RESPONSES, view, status)
+        self.maybe_flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'histograms': {
+                    key: list(value) for key, value in self.histograms.items()
+                },
+                'counters': dict(self.counters),
+            }
+
+    def maybe_flush(self, force=False):
+        directory = getattr(settings, 'METRICS_DIR', None)
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        now = time.monotonic()
+        if not directory or (not force and now - self.flushed < interval):
+            return
+        self.flushed = now
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(
+            tmp_path, os.path.join(directory, f'metrics-{os.getpid()}.json')
+        )
+
+    def collect(self):
+        """Снимок всех процессов (или только текущего без METRICS_DIR).
+
+        Снимки завершившихся процессов удаляются: перезапущенные воркеры
+        иначе копили бы файлы, и старые цифры суммировались бы вечно.
+        """
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if not directory:
+            return self.snapshot()
+        self.maybe_flush(force=True)
+        merged = {'histograms': {}, 'counters': {}}
+        for snapshot in _snapshots(directory):
+            for key, value in snapshot['histograms'].items():
+                target = merged['histograms'].setdefault(key, [0] * len(value))
+                for index, item in enumerate(value):
+                    target[index] += item
+            counters = merged['counters']
+            for key, value in snapshot['counters'].items():
+                counters[key] = counters.get(key, 0) + value
+        return merged
+
+
+registry = Registry()
+
+
+def _label(value):
+    return (
+        str(value).replace('\\', '\\\\').replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def exposition(snapshot):
+    """Текстовый формат Prometheus 0.0.4."""
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for key, data in sorted(snapshot['histograms'].items()):
+            metric, view = key.split('|', 1)
+            if metric != name:
+                continue
+            view = _label(view)
+            for bound, count in zip(buckets, data):
+                lines.append(
+                    f'{name}_bucket{{view="{view}",le="{bound}"}} {count}'
+                )
+            lines.append(
+                f'{name}_bucket{{view="{view}",le="+Inf"}} {data[-1]}'
+            )
+            lines.append(f'{name}_sum{{view="{view}"}} {_number(data[-2])}')
+            lines.append(f'{name}_count{{view="{view}"}} {data[-1]}')
+    lines.append(f'# HELP {RESPONSES} Ответы по коду статуса')
+    lines.append(f'# TYPE {RESPONSES} counter')
+    for key, count in sorted(snapshot['counters'].items()):
+        _, view, status = key.split('|')
+        lines.append(
+            f'{RESPONSES}{{view="{_label(view)}",status="{status}"}} {count}'
+        )
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,168 @@
+import hashlib
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import (get_conditional_response,
+                                patch_vary_headers)
+from django.utils.http import parse_http_date_safe
+
+from .holes import MARKER_RE, fill
+from .metrics import RequestStats, registry, set_current_stats
+from .stampede import served_stale, track_stale
+
+
+class PerformanceMiddleware:
+    """Собирает метрики запроса по имени URL-маршрута.
+
+    Время ответа, число и время SQL-запросов, время рендеринга
+    шаблонов и размер ответа попадают в гистограммы core.metrics.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        set_current_stats(stats)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            set_current_stats(None)
+        duration = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else '<unresolved>'
+        size = None if response.streaming else len(response.content)
+        registry.record(view, response.status_code, duration, stats, size)
+        return response
+
+
+class HoleMiddleware:
+    """Заполняет метки {% hole %} личными фрагментами текущего запроса.
+
+    Стоит снаружи PageCacheMiddleware: в кэш попадает страница с метками,
+    общая для всех пользователей.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.streaming
+            or not response.get('Content-Type', '').startswith('text/html')
+        ):
+            return response
+        content = response.content.decode(response.charset)
+        if not MARKER_RE.search(content):
+            return response
+        response.content = fill(request, content)
+        if response.has_header('Content-Length'):
+            response['Content-Length'] = str(len(response.content))
+        return response
+
+
+class PageCacheMiddleware:
+    """Готовые страницы без ORM и шаблонов.
+
+    Кэшируются GET-ответы представлений с core.decorators.page_cache,
+    если ответ не ставит cookie и не выдавал CSRF-токен: личные части
+    страниц вынесены в {% hole %}, поэтому тело общее для всех. Ключ -
+    путь и строка запроса. Вместе с ответом сохраняются
+    request.cache_dependencies (ключ кэша -> значение, для лент - их
+    версии): сигналы моделей меняют версии, и запись с другими значениями
+    считается промахом. Страница, где core.stampede отдал устаревший
+    фрагмент, не сохраняется: тело старше зависимостей. Гостям (без
+    сессионной cookie) попадание отдаётся без ORM; ETag и Last-Modified
+    сохранённой страницы верны только для них, поэтому вошедшим
+    валидаторы не отдаются.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.applicable(request):
+            return self.get_response(request)
+        key = self.key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            response = self.replay(request, entry)
+            if response is not None:
+                return response
+        track_stale()
+        response = self.get_response(request)
+        if (
+            request.method == 'GET'
+            and not served_stale()
+            and self.cacheable(request, response)
+        ):
+            self.store(request, key, response)
+        return response
+
+    def applicable(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        if not getattr(match.func, 'page_cache', False):
+            return False
+        request.resolver_match = match
+        return True
+
+    @staticmethod
+    def key(request):
+        url = request.get_full_path()
+        return 'page:' + hashlib.md5(url.encode()).hexdigest()
+
+    @staticmethod
+    def cacheable(request, response):
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not request.META.get('CSRF_COOKIE_USED')
+            and 'private' not in response.get('Cache-Control', '')
+            and 'no-store' not in response.get('Cache-Control', '')
+        )
+
+    def store(self, request, key, response):
+        entry = {
+            'dependencies': getattr(request, 'cache_dependencies', {}),
+            'content': response.content,
+            'headers': list(response.items()),
+        }
+        cache.set(key, entry, settings.PAGE_CACHE_TIMEOUT)
+
+    def replay(self, request, entry):
+        dependencies = entry['dependencies']
+        if dependencies and cache.get_many(dependencies) != dependencies:
+            return None
+        response = HttpResponse(entry['content'])
+        for header, value in entry['headers']:
+            response[header] = value
+        # тело общее, но личные фрагменты зависят от cookie
+        patch_vary_headers(response, ('Cookie',))
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            del response['ETag']
+            del response['Last-Modified']
+            return response
+        return get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(
+                response.get('Last-Modified', '')
+            ),
+            response=response,
+        )
@@ -0,0 +1,14 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite, где atomic() сразу берёт блокировку записи.
+
+    В отложенной транзакции (BEGIN) чтение берёт SHARED, и повышение до
+    записи при занятой базе сразу даёт SQLITE_BUSY, не дожидаясь timeout:
+    так падала одновременная запись постов из-за триггеров FTS5
+    (posts.search). BEGIN IMMEDIATE ждёт блокировку до timeout.
+    """
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,95 @@
+import math
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+
+POLL_INTERVAL = 0.05
+
+_served = threading.local()
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+def is_fresh(entry, stamp, now, beta):
+    """Вероятностный ранний пересчёт (XFetch).
+
+    Чем дольше считалось значение и чем ближе срок, тем вероятнее, что
+    запрос сочтёт его устаревшим заранее: пересчёты разносятся во времени.
+    """
+    _, expires, delta, entry_stamp = entry
+    if entry_stamp != stamp:
+        return False
+    if expires is None:
+        return True
+    return now - delta * beta * math.log(1.0 - random.random()) < expires
+
+
+def track_stale():
+    """Начинает учёт устаревших значений, отданных в этом потоке."""
+    _served.stale = False
+
+
+def served_stale():
+    """Отдавал ли поток после track_stale() устаревшее значение.
+
+    Страница, собранная из такого фрагмента, не должна кэшироваться под
+    свежими версиями данных (core.middleware.PageCacheMiddleware).
+    """
+    return getattr(_served, 'stale', False)
+
+
+def _compute(cache, key, compute, timeout, stamp):
+    started = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - started
+    if timeout is None:
+        expires = stored = None
+    else:
+        expires = time.time() + timeout
+        # после срока запись ещё живёт, чтобы отдавать её во время пересчёта
+        stored = max(timeout, 0) + settings.STAMPEDE_STALE_TIMEOUT
+    cache.set(key, (value, expires, delta, stamp), stored)
+    return value
+
+
+def get_or_compute(key, compute, timeout, stamp=None, cache=None):
+    """Значение из кэша или compute(), без лавины пересчётов.
+
+    Пересчитывает один запрос, взявший короткую блокировку; остальные
+    тем временем отдают прежнее значение (stale-while-revalidate), а если
+    его нет - ждут до STAMPEDE_WAIT секунд. stamp - версия данных: запись
+    с другой версией устарела, но годится как прежнее значение, поэтому
+    версию не нужно вносить в ключ.
+    """
+    cache = cache or default_cache
+    entry = cache.get(key)
+    if entry is not None and is_fresh(
+        entry, stamp, time.time(), settings.STAMPEDE_BETA
+    ):
+        return entry[0]
+    lock_key = _lock_key(key)
+    if cache.add(lock_key, 1, settings.STAMPEDE_LOCK_TIMEOUT):
+        try:
+            return _compute(cache, key, compute, timeout, stamp)
+        finally:
+            cache.delete(lock_key)
+    if entry is not None:
+        # ранний пересчёт XFetch отдаёт ещё верное значение
+        expires = entry[1]
+        if entry[3] != stamp or (
+            expires is not None and expires <= time.time()
+        ):
+            _served.stale = True
+        return entry[0]
+    deadline = time.monotonic() + settings.STAMPEDE_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None and entry[3] == stamp:
+            return entry[0]
+    return _compute(cache, key, compute, timeout, stamp)
@@ -0,0 +1,20 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.holes import placeholder
+
+register = template.Library()
+
+
+@register.simple_tag
+def hole(template_name, **context):
+    """Личный фрагмент в общей странице.
+
+    {% hole 'includes/header.html' %}
+    {% hole 'includes/follow_button.html' author_id=author.pk %}
+
+    Страница рендерится и кэшируется с меткой, а шаблон фрагмента
+    рендерится для каждого запроса в core.middleware.HoleMiddleware.
+    Значения контекста должны сериализоваться в JSON.
+    """
+    return mark_safe(placeholder(template_name, context))
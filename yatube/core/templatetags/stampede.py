@@ -0,0 +1,83 @@
+from django import template
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.templatetags.cache import CacheNode
+
+from core.stampede import get_or_compute
+
+register = template.Library()
+
+
+class StampedeCacheNode(CacheNode):
+    def __init__(self, nodelist, expire_time_var, fragment_name, vary_on,
+                 cache_name, stamp):
+        super().__init__(
+            nodelist, expire_time_var, fragment_name, vary_on, cache_name
+        )
+        self.stamp = stamp
+
+    def resolve(self, var, context):
+        try:
+            return var.resolve(context)
+        except template.VariableDoesNotExist:
+            raise template.TemplateSyntaxError(
+                f'"cache" tag got an unknown variable: {var.var!r}'
+            )
+
+    def render(self, context):
+        expire_time = self.resolve(self.expire_time_var, context)
+        if expire_time is not None:
+            try:
+                expire_time = int(expire_time)
+            except (ValueError, TypeError):
+                raise template.TemplateSyntaxError(
+                    f'"cache" tag got a non-integer timeout value: '
+                    f'{expire_time!r}'
+                )
+        cache_name = 'template_fragments'
+        if self.cache_name:
+            cache_name = self.resolve(self.cache_name, context)
+        try:
+            fragment_cache = caches[cache_name]
+        except InvalidCacheBackendError:
+            if self.cache_name:
+                raise template.TemplateSyntaxError(
+                    f'Invalid cache name specified for cache tag: '
+                    f'{cache_name!r}'
+                )
+            fragment_cache = caches['default']
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        stamp = self.resolve(self.stamp, context) if self.stamp else None
+        return get_or_compute(
+            make_template_fragment_key(self.fragment_name, vary_on),
+            lambda: self.nodelist.render(context),
+            expire_time, stamp, fragment_cache
+        )
+
+
+@register.tag('cache')
+def do_cache(parser, token):
+    """Как {% cache %} из django, но без лавины пересчётов (core.stampede).
+
+    {% load stampede %}
+    {% cache 20 index_page request.GET.urlencode stamp=feed_version %}
+
+    stamp - версия содержимого: её смена делает фрагмент устаревшим,
+    но пока один запрос перерисовывает его, остальные получают прежний.
+    """
+    nodelist = parser.parse(('endcache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f'{tokens[0]!r} tag requires at least 2 arguments.'
+        )
+    options = {}
+    while len(tokens) > 3 and tokens[-1].startswith(('using=', 'stamp=')):
+        name, value = tokens.pop().split('=', 1)
+        options[name] = parser.compile_filter(value)
+    return StampedeCacheNode(
+        nodelist, parser.compile_filter(tokens[1]), tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:]],
+        options.get('using'), options.get('stamp'),
+    )
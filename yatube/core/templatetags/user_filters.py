@@ -1,8 +1,31 @@
 from django import template
 
+from posts.following import is_following
+
 register = template.Library()
 
 
 @register.filter
 def addclass(field, css):
     return field.as_widget(attrs={'class': css})
+
+
+@register.filter
+def fitbox(post, geometry):
+    """Размер превью без кадрирования по сохранённым размерам картинки."""
+    if not post.image_width or not post.image_height:
+        return None
+    box_width, box_height = (int(side) for side in geometry.split('x'))
+    scale = min(
+        box_width / post.image_width, box_height / post.image_height
+    )
+    return {
+        'width': round(post.image_width * scale),
+        'height': round(post.image_height * scale),
+    }
+
+
+@register.filter
+def follows(user, author):
+    """{% if user|follows:author %} без запроса к базе; author или его id."""
+    return is_following(user, getattr(author, 'pk', author))
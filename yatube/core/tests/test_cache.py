@@ -0,0 +1,205 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import request_started
+from django.test import SimpleTestCase, override_settings
+
+from ..cache import LOG_SIZE, SQLiteCache, TieredCache, _stores
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_tests_use_own_cache_file(self):
+        path = caches['shared'].path
+        self.assertTrue(path.startswith(settings.TEST_CACHE_DIR))
+        self.assertFalse(path.startswith(settings.BASE_DIR))
+
+    def test_roundtrip_and_many(self):
+        self.cache.set('int', 5)
+        self.cache.set('obj', {'a': [1, 2]})
+        self.cache.set_many({'x': 'икс', 'y': True})
+        self.assertEqual(self.cache.get('int'), 5)
+        self.assertEqual(self.cache.get('obj'), {'a': [1, 2]})
+        self.assertIs(self.cache.get('y'), True)
+        self.assertEqual(
+            self.cache.get_many(['x', 'y', 'missing']),
+            {'x': 'икс', 'y': True}
+        )
+        self.cache.delete_many(['x', 'y'])
+        self.assertEqual(self.cache.get_many(['x', 'y']), {})
+
+    def test_big_int_is_pickled(self):
+        for value in (2 ** 70, -2 ** 63 - 1, 2 ** 63 - 1):
+            with self.subTest(value=value):
+                self.cache.set('big', value)
+                self.assertEqual(self.cache.get('big'), value)
+        self.cache.set('big', 2 ** 70)
+        with self.assertRaises(ValueError):
+            self.cache.incr('big')
+
+    def test_expiry_add_and_touch(self):
+        self.cache.set('gone', 1, timeout=-1)
+        self.assertIsNone(self.cache.get('gone'))
+        self.assertFalse(self.cache.has_key('gone'))
+        self.assertTrue(self.cache.add('gone', 2))
+        self.assertFalse(self.cache.add('gone', 3))
+        self.assertEqual(self.cache.get('gone'), 2)
+        self.assertTrue(self.cache.touch('gone', None))
+        self.assertTrue(self.cache.has_key('gone'))
+
+    def test_incr_is_atomic(self):
+        self.cache.set('counter', 0)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+        def worker():
+            for _ in range(100):
+                self.cache.incr('counter')
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get('counter'), 400)
+        self.assertEqual(self.cache.decr('counter', 10), 390)
+
+    def test_shared_between_processes(self):
+        self.cache.set('from_parent', 1)
+        script = (
+            'import sys; from core.cache import SQLiteCache; '
+            'cache = SQLiteCache(sys.argv[1], {}); '
+            'cache.incr("from_parent"); cache.set("from_child", "ok")'
+        )
+        subprocess.run(
+            [sys.executable, '-c', script, self.path], check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+        )
+        self.assertEqual(self.cache.get('from_parent'), 2)
+        self.assertEqual(self.cache.get('from_child'), 'ok')
+
+    def test_cull_evicts_least_recently_used(self):
+        cache = self.make_cache(MAX_ENTRIES=10, CULL_FREQUENCY=5)
+        for index in range(10):
+            cache.set(f'key{index}', index)
+        # key0 прочитан недавно, остальные старые записи - нет
+        cache.db.execute(
+            'UPDATE cache SET accessed = ?', (time.time() - 60,)
+        )
+        cache.get('key0')
+        cache.set('key10', 10)
+        cache.cull()
+        self.assertEqual(cache.db.execute(
+            'SELECT COUNT(*) FROM cache'
+        ).fetchone()[0], 9)
+        self.assertEqual(cache.get('key0'), 0)
+        self.assertIsNone(cache.get('key1'))
+        self.assertIsNone(cache.get('key2'))
+        self.assertEqual(cache.get('key10'), 10)
+
+
+class TieredCacheTest(SimpleTestCase):
+    """Два экземпляра с разными именами ведут себя как два процесса."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        settings = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+            },
+            'shared': {
+                'BACKEND': 'core.cache.SQLiteCache',
+                'LOCATION': os.path.join(self.directory, 'cache.sqlite3'),
+            },
+        })
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.first = self.make_cache('first')
+        self.second = self.make_cache('second')
+        # журнал заведён, оба процесса с ним сверились
+        self.first.clear()
+        self.first.sync(force=True)
+        self.second.sync(force=True)
+
+    def tearDown(self):
+        _stores.pop('first', None)
+        _stores.pop('second', None)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, name, **options):
+        return TieredCache(name, {'OPTIONS': {
+            'SHARED': 'shared', 'SYNC_INTERVAL': 60, **options
+        }})
+
+    def test_hot_key_served_from_memory(self):
+        self.first.set('key', 'value')
+        self.first.shared.delete('key')
+        self.assertEqual(self.first.get('key'), 'value')
+        self.assertIsNone(self.second.get('key'))
+
+    def test_big_int_reaches_other_process(self):
+        self.first.set('big', 2 ** 70)
+        self.assertEqual(self.second.get('big'), 2 ** 70)
+
+    def test_write_drops_other_local_copies(self):
+        self.first.set('key', 'old')
+        self.assertEqual(self.second.get('key'), 'old')
+        self.first.set('key', 'new')
+        # до сверки с журналом второй процесс отдаёт свою копию
+        self.assertEqual(self.second.get('key'), 'old')
+        request_started.send(sender=None)
+        self.assertEqual(self.second.get('key'), 'new')
+        self.first.delete('key')
+        self.second.sync(force=True)
+        self.assertIsNone(self.second.get('key'))
+
+    def test_version_stamps_across_processes(self):
+        self.first.set_many({'a': 1, 'b': 2}, None)
+        self.assertEqual(self.second.get_many(['a', 'b']), {'a': 1, 'b': 2})
+        self.assertEqual(self.first.incr('a'), 2)
+        self.second.sync(force=True)
+        self.assertEqual(self.second.get_many(['a', 'b']), {'a': 2, 'b': 2})
+
+    def test_lagging_process_clears_everything(self):
+        self.second.set('unrelated', 1)
+        self.second.shared.delete('unrelated')
+        for index in range(LOG_SIZE + 1):
+            self.first.set(f'key{index}', index)
+        self.second.sync(force=True)
+        self.assertIsNone(self.second.get('unrelated'))
+
+    def test_clear_reaches_other_processes(self):
+        self.first.set('key', 1)
+        self.assertEqual(self.second.get('key'), 1)
+        self.first.clear()
+        self.second.sync(force=True)
+        self.assertIsNone(self.second.get('key'))
+
+    def test_local_tier_is_bounded_and_copies_mutables(self):
+        cache = self.make_cache('first', LOCAL_MAX_ENTRIES=2)
+        value = {'list': [1]}
+        cache.set('a', value)
+        cache.get('a')['list'].append(2)
+        self.assertEqual(cache.get('a'), {'list': [1]})
+        cache.set('b', 2)
+        cache.set('c', 3)
+        self.assertEqual(list(cache.store.data), [
+            cache.make_key('b'), cache.make_key('c')
+        ])
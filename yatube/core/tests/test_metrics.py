@@ -0,0 +1,144 @@
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..metrics import Registry, RequestStats, exposition, registry
+
+User = get_user_model()
+
+
+class MetricsMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.user = User.objects.create_user(username='user')
+
+    def setUp(self):
+        cache.clear()
+        registry.histograms.clear()
+        registry.counters.clear()
+
+    def test_request_recorded_by_view_name(self):
+        self.client.get(reverse('posts:index'))
+        snapshot = registry.snapshot()
+        for name in ('yatube_request_duration_seconds', 'yatube_db_queries',
+                     'yatube_template_duration_seconds',
+                     'yatube_response_size_bytes'):
+            self.assertEqual(
+                snapshot['histograms'][f'{name}|posts:index'][-1], 1
+            )
+        self.assertGreater(
+            snapshot['histograms']['yatube_db_queries|posts:index'][-2], 0
+        )
+        self.assertGreater(
+            snapshot['histograms'][
+                'yatube_template_duration_seconds|posts:index'
+            ][-2], 0
+        )
+        self.assertEqual(
+            snapshot['counters']['yatube_responses_total|posts:index|200'], 1
+        )
+
+    def test_endpoint_protected(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        self.client.force_login(self.staff)
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(
+            response, '# TYPE yatube_request_duration_seconds histogram'
+        )
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_endpoint_token(self):
+        response = self.client.get(
+            '/metrics/', HTTP_AUTHORIZATION='Bearer wrong'
+        )
+        self.assertEqual(response.status_code, 403)
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(
+            '/metrics/', HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertContains(
+            response,
+            'yatube_request_duration_seconds_count{view="posts:index"} 1',
+        )
+
+
+class RegistryTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_exposition_buckets_cumulative(self):
+        metrics = Registry()
+        stats = RequestStats()
+        stats.queries = 4
+        metrics.record('view', 200, 0.02, stats, 2000)
+        metrics.record('view', 404, 3.0, stats, None)
+        text = exposition(metrics.snapshot())
+        name = 'yatube_request_duration_seconds'
+        self.assertIn(f'{name}_bucket{{view="view",le="0.01"}} 0', text)
+        self.assertIn(f'{name}_bucket{{view="view",le="0.025"}} 1', text)
+        self.assertIn(f'{name}_bucket{{view="view",le="+Inf"}} 2', text)
+        self.assertIn('yatube_db_queries_bucket{view="view",le="5"} 2', text)
+        self.assertIn('yatube_response_size_bytes_count{view="view"} 1', text)
+        self.assertIn(
+            'yatube_responses_total{view="view",status="404"} 1', text
+        )
+
+    def test_processes_merged_through_directory(self):
+        with override_settings(METRICS_DIR=self.directory):
+            first, second = Registry(), Registry()
+            for metrics in (first, second):
+                metrics.record('view', 200, 0.1, RequestStats(), 100)
+            # снимки разных процессов лежат в файлах с разными pid
+            second.maybe_flush(force=True)
+            shutil.move(
+                glob.glob(f'{self.directory}/metrics-*.json')[0],
+                f'{self.directory}/metrics-{os.getppid()}.json',
+            )
+            merged = first.collect()
+        self.assertEqual(
+            merged['histograms']['yatube_request_duration_seconds|view'][-1],
+            2,
+        )
+        self.assertEqual(
+            merged['counters']['yatube_responses_total|view|200'], 2
+        )
+
+    def test_dead_process_snapshots_removed(self):
+        with override_settings(METRICS_DIR=self.directory):
+            dead = Registry()
+            dead.record('view', 200, 0.1, RequestStats(), 100)
+            dead.maybe_flush(force=True)
+            # тот же снимок, будто его оставил завершившийся воркер
+            shutil.move(
+                glob.glob(f'{self.directory}/metrics-*.json')[0],
+                f'{self.directory}/metrics-{self.dead_pid()}.json',
+            )
+            merged = Registry().collect()
+        self.assertEqual(merged['histograms'], {})
+        self.assertEqual(
+            [os.path.basename(path) for path in glob.glob(
+                f'{self.directory}/metrics-*.json'
+            )],
+            [f'metrics-{os.getpid()}.json'],
+        )
+
+    @staticmethod
+    def dead_pid():
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        return process.pid
@@ -0,0 +1,175 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from ..holes import fill, placeholder
+from ..middleware import PageCacheMiddleware
+from ..stampede import _lock_key
+
+User = get_user_model()
+
+
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Первый пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    @staticmethod
+    def rendered(response):
+        names = [template.name for template in response.templates]
+        return 'base.html' in names
+
+    def assertServedFromCache(self, url, **extra):
+        with self.assertNumQueries(0):
+            response = self.client.get(url, **extra)
+        self.assertFalse(self.rendered(response))
+        return response
+
+    def test_anonymous_pages_cached(self):
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+            reverse('about:author'),
+        ):
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                second = self.assertServedFromCache(url)
+                self.assertEqual(second.content, first.content)
+                self.assertIn('Cookie', second['Vary'])
+
+    def test_query_string_is_part_of_key(self):
+        url = reverse('posts:index')
+        self.client.get(url)
+        response = self.client.get(url, {'page': 1})
+        self.assertTrue(self.rendered(response))
+
+    def test_new_post_purges_feeds(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+        )
+        for url in urls:
+            self.client.get(url)
+        Post.objects.create(
+            author=self.author, group=self.group, text='Второй пост'
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Второй пост')
+
+    def test_stale_fragment_page_not_stored(self):
+        url = reverse('posts:index')
+        self.client.get(url)
+        Post.objects.create(author=self.author, text='Новый пост')
+        # фрагмент ленты пересчитывает другой запрос
+        lock = _lock_key(make_template_fragment_key('index_page', ['']))
+        cache.add(lock, 1)
+        self.assertNotContains(self.client.get(url), 'Новый пост')
+        cache.delete(lock)
+        self.assertContains(self.client.get(url), 'Новый пост')
+
+    def test_comment_and_edit_purge_post_page(self):
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        self.client.get(url)
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий'
+        )
+        self.assertContains(self.client.get(url), 'Комментарий')
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        self.assertContains(self.client.get(url), 'Исправленный пост')
+        self.assertServedFromCache(url)
+
+    def test_group_edit_purges_group_page(self):
+        url = reverse('posts:group_list', args=(self.group.slug,))
+        self.client.get(url)
+        self.group.description = 'Новое описание'
+        self.group.save()
+        self.assertContains(self.client.get(url), 'Новое описание')
+
+    def test_authenticated_share_body_with_own_fragments(self):
+        url = reverse('posts:profile', args=(self.author.username,))
+        guest = self.client.get(url)
+        self.assertContains(guest, 'Войти')
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.author)
+        self.client.force_login(reader)
+        response = self.client.get(url)
+        self.assertFalse(self.rendered(response))
+        self.assertNotIn('ETag', response)
+        self.assertContains(response, 'Пользователь: reader')
+        self.assertContains(response, reverse(
+            'posts:profile_unfollow', args=(self.author.username,)
+        ))
+        self.assertNotContains(response, 'Войти')
+
+    def test_conditional_request_on_hit(self):
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        response = self.assertServedFromCache(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_csrf_and_cookies_not_cached(self):
+        request = RequestFactory().get('/')
+        response = HttpResponse('ok')
+        self.assertTrue(PageCacheMiddleware.cacheable(request, response))
+        response.set_cookie('name', 'value')
+        self.assertFalse(PageCacheMiddleware.cacheable(request, response))
+        request.META['CSRF_COOKIE_USED'] = True
+        self.assertFalse(
+            PageCacheMiddleware.cacheable(request, HttpResponse('ok'))
+        )
+
+
+class HolePunchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_comment_form_and_edit_link_per_user(self):
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        edit_url = reverse('posts:post_edit', args=(self.post.pk,))
+        response = self.client.get(url)
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+        self.assertNotContains(response, edit_url)
+        self.client.force_login(self.author)
+        response = self.client.get(url)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertContains(response, edit_url)
+        self.assertIn('csrftoken', response.cookies)
+
+    def test_invalid_comment_keeps_errors(self):
+        self.client.force_login(self.author)
+        response = self.client.post(
+            reverse('posts:add_comment', args=(self.post.pk,)), {'text': ''}
+        )
+        self.assertTrue(response.context['form'].errors)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+
+    def test_forged_marker_is_dropped(self):
+        request = RequestFactory().get('/')
+        marker = placeholder('includes/post_edit_link.html', {
+            'post_id': 1, 'author_id': 1
+        })
+        forged = marker.replace('hole:', 'hole:x')
+        self.assertEqual(fill(request, forged), '')
@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.db import connection
+from django.test import SimpleTestCase
+
+from posts import search
+from ..sqlite3.base import DatabaseWrapper
+
+
+class ImmediateTransactionTest(SimpleTestCase):
+    """Одновременные транзакции с триггерами FTS5 ждут, а не падают."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings_dict = {
+            **connection.settings_dict,
+            'NAME': os.path.join(self.directory, 'db.sqlite3'),
+            'OPTIONS': {'timeout': 30},
+        }
+        setup = self.connect()
+        with setup.cursor() as cursor:
+            cursor.execute(
+                'CREATE TABLE posts_post (id INTEGER PRIMARY KEY, text TEXT)'
+            )
+        search.install(setup)
+        setup.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def connect(self):
+        return DatabaseWrapper(self.settings_dict, 'concurrency')
+
+    def test_concurrent_inserts(self):
+        errors = []
+
+        def worker(number):
+            conn = self.connect()
+            try:
+                for index in range(25):
+                    conn._start_transaction_under_autocommit()
+                    with conn.cursor() as cursor:
+                        # чтение до записи, как проверки формы и сигналы
+                        cursor.execute('SELECT COUNT(*) FROM posts_post')
+                        time.sleep(0.002)
+                        cursor.execute(
+                            'INSERT INTO posts_post (text) VALUES (%s)',
+                            [f'пост {number} {index}']
+                        )
+                        cursor.execute('COMMIT')
+            except Exception as error:
+                errors.append(error)
+            finally:
+                conn.close()
+
+        threads = [
+            threading.Thread(target=worker, args=(number,))
+            for number in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        conn = self.connect()
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {search.FTS_TABLE} '
+                f"WHERE {search.FTS_TABLE} MATCH 'пост'"
+            )
+            self.assertEqual(cursor.fetchone()[0], 100)
+        conn.close()
@@ -0,0 +1,128 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.template import Context, Template, TemplateSyntaxError
+from django.test import SimpleTestCase, override_settings
+
+from ..stampede import (_lock_key, get_or_compute, served_stale,
+                        track_stale)
+
+
+class Counter:
+    def __init__(self, delay=0):
+        self.calls = 0
+        self.delay = delay
+
+    def __call__(self):
+        time.sleep(self.delay)
+        self.calls += 1
+        return f'value{self.calls}'
+
+
+@override_settings(STAMPEDE_BETA=0)
+class GetOrComputeTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_fresh_value_is_not_recomputed(self):
+        compute = Counter()
+        self.assertEqual(get_or_compute('key', compute, 60), 'value1')
+        self.assertEqual(get_or_compute('key', compute, 60), 'value1')
+        self.assertEqual(compute.calls, 1)
+
+    def test_stale_value_served_while_locked(self):
+        get_or_compute('key', Counter(), -1)
+        cache.add(_lock_key('key'), 1)
+        compute = Counter()
+        self.assertEqual(get_or_compute('key', compute, 60), 'value1')
+        self.assertEqual(compute.calls, 0)
+        cache.delete(_lock_key('key'))
+        self.assertEqual(get_or_compute('key', compute, 60), 'value1')
+        self.assertEqual(compute.calls, 1)
+
+    def test_served_stale_tracked(self):
+        get_or_compute('key', Counter(), 60, stamp=1)
+        cache.add(_lock_key('key'), 1)
+        track_stale()
+        get_or_compute('key', Counter(), 60, stamp=1)
+        self.assertFalse(served_stale())
+        with self.settings(STAMPEDE_BETA=10 ** 6):
+            get_or_compute('key', Counter(), 60, stamp=1)
+        self.assertFalse(served_stale())
+        get_or_compute('key', Counter(), 60, stamp=2)
+        self.assertTrue(served_stale())
+        track_stale()
+        self.assertFalse(served_stale())
+
+    def test_stamp_change_recomputes(self):
+        compute = Counter()
+        get_or_compute('key', compute, 60, stamp=1)
+        self.assertEqual(get_or_compute('key', compute, 60, stamp=1), 'value1')
+        self.assertEqual(get_or_compute('key', compute, 60, stamp=2), 'value2')
+
+    @override_settings(STAMPEDE_WAIT=0.1)
+    def test_waits_for_leader_then_computes(self):
+        cache.add(_lock_key('key'), 1)
+        compute = Counter()
+        self.assertEqual(get_or_compute('key', compute, 60), 'value1')
+        self.assertEqual(compute.calls, 1)
+
+    def test_early_expiration(self):
+        get_or_compute('key', Counter(delay=0.01), 60)
+        compute = Counter()
+        with self.settings(STAMPEDE_BETA=10 ** 6):
+            self.assertEqual(get_or_compute('key', compute, 60), 'value1')
+        self.assertEqual(compute.calls, 1)
+
+    def test_single_flight_under_concurrency(self):
+        get_or_compute('key', Counter(), -1)
+        compute = Counter(delay=0.2)
+        results = []
+
+        def worker():
+            results.append(get_or_compute('key', compute, 60))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(compute.calls, 1)
+        self.assertEqual(sorted(results), ['value1'] * 8)
+
+
+@override_settings(STAMPEDE_BETA=0)
+class CacheTagTest(SimpleTestCase):
+    TEMPLATE = (
+        '{% load stampede %}'
+        '{% cache 60 fragment name stamp=version %}{{ counter }}{% endcache %}'
+    )
+
+    def setUp(self):
+        cache.clear()
+
+    def render(self, source=TEMPLATE, **context):
+        return Template(source).render(Context(context))
+
+    def test_fragment_cached_per_vary_on_and_stamp(self):
+        compute = Counter()
+        self.assertEqual(
+            self.render(counter=compute, name='a', version=1), 'value1'
+        )
+        self.assertEqual(
+            self.render(counter=compute, name='a', version=1), 'value1'
+        )
+        self.assertEqual(
+            self.render(counter=compute, name='b', version=1), 'value2'
+        )
+        self.assertEqual(
+            self.render(counter=compute, name='a', version=2), 'value3'
+        )
+
+    def test_invalid_cache_name(self):
+        with self.assertRaises(TemplateSyntaxError):
+            self.render(
+                '{% load stampede %}'
+                '{% cache 60 x using="nope" %}{% endcache %}'
+            )
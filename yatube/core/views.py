@@ -1,4 +1,9 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from .metrics import exposition, registry
 
 
 def page_not_found(request, exception):
@@ -11,3 +16,18 @@ def csrf_failure(request, reason=''):
 
 def server_error(request):
     return render(request, "core/500.html", status=500)
+
+
+def metrics(request):
+    """Метрики в формате Prometheus: для staff или по METRICS_TOKEN."""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    allowed = request.user.is_staff or (
+        token and constant_time_compare(header, f'Bearer {token}')
+    )
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        exposition(registry.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -0,0 +1,97 @@
+import time
+
+from django.core.cache import cache
+from django.utils.translation import get_language
+
+INDEX_FEED = 'index'
+
+
+def follow_feed(user_id):
+    return f'follow:{user_id}'
+
+
+def following(user_id):
+    """Версия набора подписок пользователя (posts.following)."""
+    return f'following:{user_id}'
+
+
+def group_feed(slug):
+    return f'group:{slug}'
+
+
+def profile_feed(username):
+    return f'profile:{username}'
+
+
+def post_page(post_id):
+    return f'post:{post_id}'
+
+
+def author_cards(user_id):
+    """Версия карточек постов автора: в них его имя."""
+    return f'author_cards:{user_id}'
+
+
+def group_cards(group_id):
+    """Версия карточек постов группы: в них её slug."""
+    return f'group_cards:{group_id}'
+
+
+def _card_scopes(post):
+    scopes = [author_cards(post.author_id)]
+    if post.group_id is not None:
+        scopes.append(group_cards(post.group_id))
+    return scopes
+
+
+def post_card_keys(posts):
+    """Ключи HTML карточек постов.
+
+    Правка поста меняет updated_at, правка автора или группы - их версии;
+    версии всех карточек читаются одним get_many.
+    """
+    scopes = {scope for post in posts for scope in _card_scopes(post)}
+    versions = dict(zip(scopes, feed_versions(*scopes))) if scopes else {}
+    language = get_language()
+    keys = []
+    for post in posts:
+        stamp = int(post.updated_at.timestamp() * 1_000_000)
+        tail = ':'.join(str(versions[scope]) for scope in _card_scopes(post))
+        keys.append(f'post_card:{post.pk}:{stamp}:{tail}:{language}')
+    return keys
+
+
+def post_card_key(post):
+    return post_card_keys([post])[0]
+
+
+def version_key(feed):
+    return f'feed_version:{feed}'
+
+
+def feed_versions(*feeds):
+    """Версии лент (время последней инвалидации в нс) одним get_many.
+
+    Вытесненная из кэша версия заводится заново текущим временем, так что
+    она может только вырасти и устаревшие данные не всплывут.
+    """
+    keys = [version_key(feed) for feed in feeds]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        now = time.time_ns()
+        for key in missing:
+            cache.add(key, now, None)
+        found.update(cache.get_many(missing))
+    return [found.get(key) for key in keys]
+
+
+def feed_version(feed):
+    """Текущая версия ленты; входит в ключ фрагментного кэша шаблона."""
+    return feed_versions(feed)[0]
+
+
+def invalidate(*feeds):
+    """Сменой версии делает недоступными все закэшированные страницы лент."""
+    version = time.time_ns()
+    cache.set_many({version_key(feed): version for feed in feeds}, None)
@@ -0,0 +1,78 @@
+from datetime import datetime, timezone
+
+from django.views.decorators.http import condition
+
+from .caching import (INDEX_FEED, feed_versions, follow_feed, group_feed,
+                      post_page, profile_feed, version_key)
+from .models import Post
+
+
+def feed_condition(scopes, per_viewer=False):
+    """ETag/Last-Modified по версиям лент, от которых зависит страница.
+
+    scopes(request, *args, **kwargs) возвращает список лент или None,
+    если валидатор посчитать нельзя (тогда страница рендерится как обычно).
+    per_viewer добавляет ленту подписок зрителя: от неё зависят только
+    личные фрагменты страницы, поэтому в зависимости кэша она не входит.
+    """
+    def versions(request, *args, **kwargs):
+        if not hasattr(request, '_feed_versions'):
+            feeds = scopes(request, *args, **kwargs)
+            if feeds is None:
+                request._feed_versions = None
+                return None
+            shared = len(feeds)
+            if per_viewer:
+                feeds = [*feeds, *_viewer_feeds(request)]
+            request._feed_versions = feed_versions(*feeds)
+            # для core.middleware.PageCacheMiddleware
+            request.cache_dependencies = dict(zip(
+                map(version_key, feeds[:shared]),
+                request._feed_versions[:shared]
+            ))
+        return request._feed_versions
+
+    def etag(request, *args, **kwargs):
+        stamps = versions(request, *args, **kwargs)
+        if stamps is None:
+            return None
+        user = request.user.pk or 0
+        return '-'.join(map(str, [user, *stamps]))
+
+    def last_modified(request, *args, **kwargs):
+        # If-Modified-Since не учитывает пользователя: только для гостей
+        if request.user.is_authenticated:
+            return None
+        stamps = versions(request, *args, **kwargs)
+        if not stamps:
+            return None
+        return datetime.fromtimestamp(max(stamps) / 1e9, tz=timezone.utc)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def _viewer_feeds(request):
+    if request.user.is_authenticated:
+        return [follow_feed(request.user.pk)]
+    return []
+
+
+def index_scopes(request):
+    return [INDEX_FEED]
+
+
+def group_scopes(request, slug):
+    return [group_feed(slug)]
+
+
+def profile_scopes(request, username):
+    return [profile_feed(username)]
+
+
+def post_scopes(request, post_id):
+    username = Post.objects.filter(pk=post_id).values_list(
+        'author__username', flat=True
+    ).first()
+    if username is None:
+        return None
+    return [post_page(post_id), profile_feed(username)]
@@ -0,0 +1,53 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .models import Follow, Group, Post, UserStats
+
+
+def _bump(queryset, field, delta):
+    """Сдвигает счётчик; 0 обновлённых строк - строки нет."""
+    value = F(field) + delta
+    if delta < 0:
+        # счётчик не уходит в минус; расхождение исправит reconcile
+        value = Greatest(value, 0)
+    return queryset.update(**{field: value})
+
+
+def recount_user(user_id):
+    UserStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'posts_count': Post.objects.filter(author_id=user_id).count(),
+            'followers_count': Follow.objects.filter(
+                author_id=user_id
+            ).count(),
+            'following_count': Follow.objects.filter(
+                user_id=user_id
+            ).count(),
+        }
+    )
+
+
+def stats_for(user):
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        recount_user(user.pk)
+        return UserStats.objects.get(user_id=user.pk)
+
+
+def bump_user(user_id, field, delta):
+    updated = _bump(UserStats.objects.filter(user_id=user_id), field, delta)
+    # без строки уменьшать нечего: её пересчитает stats_for при чтении,
+    # а при каскадном удалении пользователя создавать её нельзя
+    if not updated and delta > 0:
+        recount_user(user_id)
+
+
+def bump_group(group_id, delta):
+    if group_id is not None:
+        _bump(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def bump_post(post_id, delta):
+    _bump(Post.objects.filter(pk=post_id), 'comments_count', delta)
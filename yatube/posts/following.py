@@ -0,0 +1,69 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import caching
+from .models import Follow
+
+TOO_MANY = None
+
+
+class FollowedAuthors:
+    """LRU процесса: user_id -> (версия, frozenset id авторов).
+
+    Актуальность сверяется с версией caching.following(user_id), которую
+    меняют сигналы подписки, поэтому все воркеры видят изменения.
+    Объём ограничен суммарным числом id (FOLLOWING_CACHE_MAX_IDS);
+    списки длиннее FOLLOWING_CACHE_USER_LIMIT не держатся в памяти.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.size = 0
+
+    def _drop(self, user_id):
+        _, ids = self.entries.pop(user_id)
+        self.size -= len(ids) if ids else 1
+
+    def get(self, user_id):
+        """Множество id авторов или TOO_MANY для огромных списков."""
+        version = caching.feed_version(caching.following(user_id))
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None and entry[0] == version:
+                self.entries.move_to_end(user_id)
+                return entry[1]
+        limit = settings.FOLLOWING_CACHE_USER_LIMIT
+        ids = list(Follow.objects.filter(user_id=user_id).values_list(
+            'author_id', flat=True
+        )[:limit + 1])
+        ids = frozenset(ids) if len(ids) <= limit else TOO_MANY
+        with self.lock:
+            if user_id in self.entries:
+                self._drop(user_id)
+            self.entries[user_id] = (version, ids)
+            self.size += len(ids) if ids else 1
+            while self.size > settings.FOLLOWING_CACHE_MAX_IDS:
+                self._drop(next(iter(self.entries)))
+        return ids
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+followed_authors = FollowedAuthors()
+
+
+def is_following(user, author_id):
+    if not user.is_authenticated or user.pk == author_id:
+        return False
+    ids = followed_authors.get(user.pk)
+    if ids is TOO_MANY:
+        return Follow.objects.filter(
+            user_id=user.pk, author_id=author_id
+        ).exists()
+    return author_id in ids
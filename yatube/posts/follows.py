@@ -0,0 +1,55 @@
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+
+from .models import Follow, User
+
+FOLLOW = Follow._meta.db_table
+USER = User._meta.db_table
+
+
+def _instances(rows):
+    return [
+        Follow(pk=pk, user_id=user_id, author_id=author_id)
+        for pk, user_id, author_id in rows
+    ]
+
+
+def follow(user, username):
+    """Подписка одним INSERT: автор ищется подзапросом по username,
+    повтор гасит уникальный индекс. Возвращает True, если подписка новая.
+
+    Сигналы post_save отправляются вручную, чтобы лента, счётчики и кэш
+    обновлялись так же, как при Follow.objects.create().
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {FOLLOW} (user_id, author_id) '
+            f'SELECT %s, id FROM {USER} WHERE username = %s AND id <> %s '
+            f'ON CONFLICT DO NOTHING '
+            f'RETURNING id, user_id, author_id',
+            [user.pk, username, user.pk]
+        )
+        rows = cursor.fetchall()
+    for instance in _instances(rows):
+        post_save.send(
+            sender=Follow, instance=instance, created=True,
+            update_fields=None, raw=False, using=connection.alias
+        )
+    return bool(rows)
+
+
+def unfollow(user, username):
+    """Отписка одним DELETE по username автора. True, если была подписка."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FOLLOW} WHERE user_id = %s AND author_id = '
+            f'(SELECT id FROM {USER} WHERE username = %s) '
+            f'RETURNING id, user_id, author_id',
+            [user.pk, username]
+        )
+        rows = cursor.fetchall()
+    for instance in _instances(rows):
+        post_delete.send(
+            sender=Follow, instance=instance, using=connection.alias
+        )
+    return bool(rows)
@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from .images import EMPTY_METADATA, image_metadata
 from .models import Comment, Follow, Post
 
 
@@ -18,6 +20,18 @@ class PostForm(forms.ModelForm):
             'image': 'Загрузите изображение'
         }
 
+    def clean(self):
+        cleaned_data = super().clean()
+        image = cleaned_data.get('image')
+        if 'image' in self.changed_data:
+            if isinstance(image, UploadedFile):
+                metadata = image_metadata(image)
+            else:
+                metadata = EMPTY_METADATA
+            for field, value in metadata.items():
+                setattr(self.instance, field, value)
+        return cleaned_data
+
 
 class CommentForm(forms.ModelForm):
 
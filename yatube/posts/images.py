@@ -0,0 +1,32 @@
+import hashlib
+
+from django.core.files.images import get_image_dimensions
+
+EMPTY_METADATA = {
+    'image_width': None,
+    'image_height': None,
+    'image_size': None,
+    'image_hash': '',
+}
+
+
+def image_metadata(file):
+    """Размеры, объём и sha256 картинки; файл читается один раз."""
+    image = getattr(file, 'image', None)
+    if image is not None:
+        width, height = image.size
+    else:
+        width, height = get_image_dimensions(file)
+    digest = hashlib.sha256()
+    size = 0
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_size': size,
+        'image_hash': digest.hexdigest(),
+    }
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from posts.images import image_metadata
+from posts.models import Post
+from posts.utils import pk_chunks
+
+FIELDS = (
+    'image_width', 'image_height', 'image_size', 'image_hash', 'updated_at'
+)
+
+
+class Command(BaseCommand):
+    help = 'Заполняет размеры, объём и хеш картинок у существующих постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        filled = missing = 0
+        now = timezone.now()
+        for ids in pk_chunks(Post, options['chunk_size']):
+            posts = Post.objects.filter(
+                pk__in=ids, image_width__isnull=True
+            ).exclude(image='').only('pk', 'image')
+            changed = []
+            for post in posts.iterator():
+                try:
+                    with post.image.open('rb') as file:
+                        metadata = image_metadata(file)
+                except OSError:
+                    missing += 1
+                    continue
+                for field, value in metadata.items():
+                    setattr(post, field, value)
+                # bulk_update не трогает auto_now, а от размеров зависит
+                # закэшированная карточка поста
+                post.updated_at = now
+                changed.append(post)
+            with transaction.atomic():
+                Post.objects.bulk_update(changed, FIELDS)
+            filled += len(changed)
+        self.stdout.write(self.style.SUCCESS(
+            f'Заполнено: {filled}, файлов не найдено: {missing}'
+        ))
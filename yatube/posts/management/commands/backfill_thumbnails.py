@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+from posts.utils import pk_chunks
+
+
+class Command(BaseCommand):
+    help = 'Ставит в очередь превью для уже существующих постов с картинками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        queued = 0
+        for ids in pk_chunks(Post, options['chunk_size']):
+            with_images = list(
+                Post.objects.filter(pk__in=ids).exclude(image='').values_list(
+                    'pk', flat=True
+                )
+            )
+            thumbnails.enqueue(with_images)
+            queued += len(with_images)
+        self.stdout.write(self.style.SUCCESS(
+            f'Поставлено в очередь: {queued}'
+        ))
@@ -0,0 +1,251 @@
+import csv
+import json
+import sys
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import caching, counters, thumbnails, timeline
+from posts.models import Follow, Group, Post, User
+from posts.utils import explicit_dates
+
+KINDS = ('group', 'post', 'follow')
+
+
+def read_jsonl(file):
+    for line in file:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def read_csv(file):
+    yield from csv.DictReader(file)
+
+
+class Lookup:
+    """Кэш username/slug -> pk; промахи добираются одним запросом."""
+
+    def __init__(self, queryset, key):
+        self.queryset = queryset
+        self.key = key
+        self.ids = {}
+
+    def resolve(self, keys):
+        missing = {key for key in keys if key and key not in self.ids}
+        if missing:
+            self.ids.update(self.queryset.filter(
+                **{f'{self.key}__in': missing}
+            ).values_list(self.key, 'pk'))
+        return missing - set(self.ids)
+
+    def get(self, key):
+        return self.ids.get(key)
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковый импорт групп, постов и подписок из JSONL или CSV. '
+        'Тип записи задаётся полем type: group, post или follow.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или - для stdin')
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'), default=None,
+            help='По умолчанию определяется по расширению файла'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--create-users', action='store_true',
+            help='Создавать неизвестных пользователей без пароля'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format']
+        if fmt is None:
+            fmt = 'csv' if path.endswith('.csv') else 'jsonl'
+        self.batch_size = options['batch_size']
+        self.create_users = options['create_users']
+        self.users = Lookup(User.objects.all(), 'username')
+        self.groups = Lookup(Group.objects.all(), 'slug')
+        self.stats = dict.fromkeys(KINDS + ('skipped',), 0)
+        reader = read_csv if fmt == 'csv' else read_jsonl
+        started = time.monotonic()
+        if path == '-':
+            self.run(reader(sys.stdin), started)
+        else:
+            try:
+                with open(path, encoding='utf-8', newline='') as file:
+                    self.run(reader(file), started)
+            except OSError as error:
+                raise CommandError(error)
+        caching.invalidate(caching.INDEX_FEED)
+        self.report(started, final=True)
+
+    def run(self, records, started):
+        # bulk_create иначе перезапишет дату архива через auto_now_add
+        with explicit_dates(Post._meta.get_field('pub_date')):
+            while True:
+                batch = list(islice(records, self.batch_size))
+                if not batch:
+                    return
+                by_kind = {kind: [] for kind in KINDS}
+                for record in batch:
+                    kind = record.get('type') or 'post'
+                    if kind in by_kind:
+                        by_kind[kind].append(record)
+                    else:
+                        self.stats['skipped'] += 1
+                with transaction.atomic():
+                    self.import_groups(by_kind['group'])
+                    self.import_posts(by_kind['post'])
+                    self.import_follows(by_kind['follow'])
+                self.report(started)
+
+    def resolve_users(self, usernames):
+        missing = self.users.resolve(usernames)
+        if missing and self.create_users:
+            User.objects.bulk_create(
+                (User(username=name, password='!') for name in missing),
+                ignore_conflicts=True
+            )
+            self.users.resolve(missing)
+
+    def import_groups(self, records):
+        if not records:
+            return
+        self.groups.resolve(record.get('slug') for record in records)
+        new = {}
+        for record in records:
+            slug = record.get('slug')
+            if not slug or self.groups.get(slug) or slug in new:
+                self.stats['skipped'] += 1
+                continue
+            new[slug] = Group(
+                slug=slug,
+                title=record.get('title') or slug,
+                description=record.get('description') or ''
+            )
+        Group.objects.bulk_create(new.values(), ignore_conflicts=True)
+        self.groups.resolve(new)
+        self.stats['group'] += len(new)
+
+    def import_posts(self, records):
+        if not records:
+            return
+        self.resolve_users(record.get('author') for record in records)
+        self.groups.resolve(record.get('group') for record in records)
+        now = timezone.now()
+        posts = []
+        for record in records:
+            author_id = self.users.get(record.get('author'))
+            text = record.get('text')
+            try:
+                pub_date = parse_datetime(record.get('pub_date') or '') or now
+            except (TypeError, ValueError):
+                # формат верный, а даты нет: 2020-13-01T00:00
+                pub_date = None
+            if author_id is None or not text or pub_date is None:
+                self.stats['skipped'] += 1
+                continue
+            posts.append(Post(
+                author_id=author_id,
+                group_id=self.groups.get(record.get('group')),
+                text=text,
+                image=record.get('image') or '',
+                pub_date=pub_date,
+            ))
+        # SQLite не возвращает pk из bulk_create: новые строки ищем по pk
+        last_pk = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        Post.objects.bulk_create(posts, batch_size=self.batch_size)
+        created = list(Post.objects.filter(pk__gt=last_pk).values_list(
+            'pk', 'author_id', 'group_id', 'pub_date', 'image'
+        ))
+        self.after_posts(created)
+        self.stats['post'] += len(created)
+
+    def after_posts(self, created):
+        """Повторяет то, что для одиночного save() делают сигналы."""
+        timeline.fan_out_many(
+            [(pk, author_id, pub_date)
+             for pk, author_id, _, pub_date, _ in created]
+        )
+        per_author, per_group = {}, {}
+        for _, author_id, group_id, _, _ in created:
+            per_author[author_id] = per_author.get(author_id, 0) + 1
+            per_group[group_id] = per_group.get(group_id, 0) + 1
+        for author_id, count in per_author.items():
+            counters.bump_user(author_id, 'posts_count', count)
+        for group_id, count in per_group.items():
+            counters.bump_group(group_id, count)
+        thumbnails.enqueue(pk for pk, *_, image in created if image)
+        followers = Follow.objects.filter(
+            author_id__in=per_author
+        ).values_list('user_id', flat=True).distinct()
+        usernames = User.objects.filter(pk__in=per_author).values_list(
+            'username', flat=True
+        )
+        slugs = Group.objects.filter(pk__in=per_group).values_list(
+            'slug', flat=True
+        )
+        caching.invalidate(
+            *(caching.follow_feed(user_id) for user_id in followers),
+            *(caching.profile_feed(username) for username in usernames),
+            *(caching.group_feed(slug) for slug in slugs)
+        )
+
+    def import_follows(self, records):
+        if not records:
+            return
+        self.resolve_users(
+            name for record in records
+            for name in (record.get('user'), record.get('author'))
+        )
+        pairs = set()
+        for record in records:
+            user_id = self.users.get(record.get('user'))
+            author_id = self.users.get(record.get('author'))
+            if user_id is None or author_id is None or user_id == author_id:
+                self.stats['skipped'] += 1
+                continue
+            pairs.add((user_id, author_id))
+        existing = set()
+        for user_id, author_id in Follow.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs},
+            author_id__in={author_id for _, author_id in pairs},
+        ).values_list('user_id', 'author_id'):
+            existing.add((user_id, author_id))
+        pairs -= existing
+        Follow.objects.bulk_create(
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in pairs
+        )
+        for user_id, author_id in pairs:
+            timeline.backfill(user_id, author_id)
+            counters.bump_user(author_id, 'followers_count', 1)
+            counters.bump_user(user_id, 'following_count', 1)
+        caching.invalidate(
+            *{caching.follow_feed(user_id) for user_id, _ in pairs}
+        )
+        self.stats['follow'] += len(pairs)
+
+    def report(self, started, final=False):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        total = sum(self.stats[kind] for kind in KINDS)
+        message = (
+            f'группы {self.stats["group"]}, посты {self.stats["post"]}, '
+            f'подписки {self.stats["follow"]}, '
+            f'пропущено {self.stats["skipped"]}; '
+            f'{total / elapsed:.0f} строк/с'
+        )
+        if final:
+            self.stdout.write(self.style.SUCCESS(f'Готово: {message}'))
+        else:
+            self.stdout.write(message)
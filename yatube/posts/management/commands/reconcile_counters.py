@@ -0,0 +1,120 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+from posts.utils import pk_chunks
+
+
+def grouped(queryset, field):
+    return dict(
+        queryset.values_list(field).annotate(Count('pk')).order_by()
+    )
+
+
+def expected_user_counts(ids):
+    return {
+        'posts_count': grouped(
+            Post.objects.filter(author_id__in=ids), 'author_id'
+        ),
+        'followers_count': grouped(
+            Follow.objects.filter(author_id__in=ids), 'author_id'
+        ),
+        'following_count': grouped(
+            Follow.objects.filter(user_id__in=ids), 'user_id'
+        ),
+    }
+
+
+def expected_group_counts(ids):
+    return {
+        'posts_count': grouped(
+            Post.objects.filter(group_id__in=ids), 'group_id'
+        ),
+    }
+
+
+def expected_post_counts(ids):
+    return {
+        'comments_count': grouped(
+            Comment.objects.filter(post_id__in=ids), 'post_id'
+        ),
+    }
+
+
+class Drift:
+    def __init__(self):
+        self.checked = 0
+        self.rows = 0
+        self.total = 0
+        self.created = 0
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счётчики пользователей, групп '
+        'и постов пачками по первичному ключу и исправляет расхождения'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Сколько строк проверять в одной транзакции'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать расхождения, ничего не записывая'
+        )
+
+    def handle(self, *args, **options):
+        self.chunk_size = options['chunk_size']
+        self.dry_run = options['dry_run']
+        targets = (
+            ('users', User, UserStats, 'user_id', expected_user_counts),
+            ('groups', Group, Group, 'pk', expected_group_counts),
+            ('posts', Post, Post, 'pk', expected_post_counts),
+        )
+        for label, source, model, key, expected in targets:
+            drift = Drift()
+            for ids in pk_chunks(source, self.chunk_size):
+                with transaction.atomic():
+                    self.reconcile_chunk(ids, model, key, expected, drift)
+            self.report(label, drift)
+
+    def reconcile_chunk(self, ids, model, key, expected, drift):
+        counts = expected(ids)
+        fields = list(counts)
+        stored = {
+            row[key]: row
+            for row in model.objects.filter(
+                **{f'{key}__in': ids}
+            ).values(key, *fields).iterator()
+        }
+        changed = []
+        missing = []
+        for pk in ids:
+            drift.checked += 1
+            actual = {field: counts[field].get(pk, 0) for field in fields}
+            row = stored.get(pk)
+            if row is None:
+                missing.append(model(**{key: pk}, **actual))
+                drift.created += 1
+                continue
+            delta = sum(abs(row[field] - actual[field]) for field in fields)
+            if delta:
+                drift.rows += 1
+                drift.total += delta
+                changed.append(model(**{key: pk}, **actual))
+        if self.dry_run:
+            return
+        if changed:
+            model.objects.bulk_update(changed, fields)
+        if missing:
+            model.objects.bulk_create(missing, ignore_conflicts=True)
+
+    def report(self, label, drift):
+        style = self.style.WARNING if drift.rows else self.style.SUCCESS
+        self.stdout.write(style(
+            f'{label}: проверено {drift.checked}, расхождений {drift.rows} '
+            f'(суммарно {drift.total}), создано {drift.created}'
+        ))
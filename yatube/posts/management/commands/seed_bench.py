@@ -0,0 +1,226 @@
+import bisect
+import io
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from posts import caching, thumbnails, timeline
+from posts.images import image_metadata
+from posts.models import Comment, Follow, Group, Post, User
+from posts.utils import explicit_dates
+
+# большой простой множитель разбрасывает ранги популярности по pk
+SCATTER = 2_147_483_647
+
+
+class Zipf:
+    """Выбор индекса 0..n-1 с весом 1 / (rank + 1) ** exponent."""
+
+    def __init__(self, rng, n, exponent):
+        self.rng = rng
+        self.n = n
+        self.cum_weights = list(accumulate(
+            1 / (rank + 1) ** exponent for rank in range(n)
+        ))
+
+    def __call__(self):
+        point = self.rng.random() * self.cum_weights[-1]
+        return bisect.bisect(self.cum_weights, point)
+
+    def scattered(self):
+        return (self() + 1) * SCATTER % self.n
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует синтетическую нагрузку: пользователей, группы, посты '
+        'со скошенным распределением по авторам и группам, комментарии, '
+        'степенной граф подписок и, по желанию, картинки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100_000)
+        parser.add_argument('--comments', type=int, default=200_000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок на пользователя'
+        )
+        parser.add_argument(
+            '--images', type=int, default=0,
+            help='Сколько постов снабдить сгенерированными картинками'
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='bench')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = options['prefix']
+        self.now = timezone.now()
+        self.since = self.now - timedelta(days=options['days'])
+        self.sentences = [self.fake.sentence() for _ in range(2000)]
+        started = time.monotonic()
+
+        user_ids = self.stage('пользователи', User, self.users(
+            options['users']
+        ))
+        group_ids = self.stage('группы', Group, self.groups(
+            options['groups']
+        ))
+        authors = Zipf(self.rng, len(user_ids), 1.1)
+        with explicit_dates(
+            Post._meta.get_field('pub_date'),
+            Comment._meta.get_field('created'),
+        ):
+            post_ids = self.stage('посты', Post, self.posts(
+                options['posts'], user_ids, group_ids, authors
+            ))
+            self.stage('комментарии', Comment, self.comments(
+                options['comments'], post_ids, user_ids, authors
+            ))
+        self.stage('подписки', Follow, self.follows(
+            options['follows'], user_ids, Zipf(self.rng, len(user_ids), 1.1)
+        ))
+        timeline.rebuild()
+        if options['images']:
+            self.images(options['images'], post_ids)
+        call_command('reconcile_counters', stdout=self.stdout)
+        caching.invalidate(caching.INDEX_FEED)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - started:.1f} с'
+        ))
+
+    def stage(self, label, model, objects):
+        """Вставляет пачками и возвращает pk новых строк."""
+        started = time.monotonic()
+        last_pk = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        total = 0
+        while True:
+            batch = list(islice(objects, self.batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            total += len(batch)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f'{label}: {total} ({total / elapsed:.0f} строк/с)'
+        )
+        # SQLite не возвращает pk из bulk_create
+        return list(model.objects.filter(pk__gt=last_pk).order_by(
+            'pk'
+        ).values_list('pk', flat=True))
+
+    def text(self, low, high):
+        return ' '.join(
+            self.rng.choice(self.sentences)
+            for _ in range(self.rng.randint(low, high))
+        )
+
+    def moment(self, start):
+        # свежие даты встречаются чаще: лента растёт со временем
+        span = (self.now - start).total_seconds()
+        return start + timedelta(seconds=span * self.rng.random() ** 0.5)
+
+    def users(self, count):
+        for index in range(count):
+            yield User(
+                username=f'{self.prefix}-{index}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password='!',
+            )
+
+    def groups(self, count):
+        for index in range(count):
+            yield Group(
+                title=self.fake.catch_phrase()[:200],
+                slug=f'{self.prefix}-{index}',
+                description=self.text(1, 3),
+            )
+
+    def posts(self, count, user_ids, group_ids, authors):
+        groups = Zipf(self.rng, len(group_ids), 1.0) if group_ids else None
+        for _ in range(count):
+            group_id = None
+            if groups and self.rng.random() < 0.7:
+                group_id = group_ids[groups()]
+            yield Post(
+                author_id=user_ids[authors()],
+                group_id=group_id,
+                text=self.text(1, 8),
+                pub_date=self.moment(self.since),
+            )
+
+    def comments(self, count, post_ids, user_ids, authors):
+        if not post_ids:
+            return
+        popular = Zipf(self.rng, len(post_ids), 1.0)
+        for _ in range(count):
+            yield Comment(
+                post_id=post_ids[popular.scattered()],
+                author_id=user_ids[authors()],
+                text=self.text(1, 2),
+                created=self.moment(self.since),
+            )
+
+    def follows(self, average, user_ids, popular):
+        """Число подписок у читателя по Парето, популярность авторов по Ципфу.
+
+        Популярность не совпадает с плодовитостью: иначе самые пишущие
+        авторы собирают всех подписчиков и ленты разрастаются на порядки.
+        """
+        if len(user_ids) < 2:
+            return
+        scale = average / 3
+        for user_id in user_ids:
+            degree = int(scale * self.rng.paretovariate(1.5))
+            degree = min(degree, len(user_ids) - 1)
+            targets = set()
+            for _ in range(degree * 3):
+                if len(targets) == degree:
+                    break
+                author_id = user_ids[popular.scattered()]
+                if author_id != user_id:
+                    targets.add(author_id)
+            for author_id in targets:
+                yield Follow(user_id=user_id, author_id=author_id)
+
+    def images(self, count, post_ids):
+        started = time.monotonic()
+        chosen = self.rng.sample(post_ids, min(count, len(post_ids)))
+        for post_id in chosen:
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            size = (self.rng.randint(320, 1600), self.rng.randint(240, 1200))
+            buffer = io.BytesIO()
+            Image.new('RGB', size, color).save(buffer, 'JPEG')
+            content = ContentFile(buffer.getvalue())
+            metadata = image_metadata(content)
+            post = Post(pk=post_id)
+            post.image.save(
+                f'{self.prefix}-{post_id}.jpg', content, save=False
+            )
+            Post.objects.filter(pk=post_id).update(
+                image=post.image.name, updated_at=timezone.now(), **metadata
+            )
+        thumbnails.enqueue(chosen)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f'картинки: {len(chosen)} ({len(chosen) / elapsed:.0f} шт/с)'
+        )
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Строит превью картинок постов из очереди ThumbnailJob'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument(
+            '--sleep', type=float, default=2.0,
+            help='Пауза между опросами пустой очереди, секунды'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь и завершиться'
+        )
+
+    def handle(self, *args, **options):
+        done = 0
+        while True:
+            processed = thumbnails.process(options['batch_size'])
+            done += processed
+            if processed:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f'Обработано заданий: {done}'))
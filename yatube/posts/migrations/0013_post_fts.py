@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from posts import search
+
+
+def install_fts(apps, schema_editor):
+    search.install(schema_editor.connection)
+
+
+def remove_fts(apps, schema_editor):
+    if not search.enabled(schema_editor.connection):
+        return
+    for name in search.TRIGGERS:
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+    schema_editor.execute(f'DROP TABLE IF EXISTS {search.FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_image_metadata'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_fts, remove_fts),
+    ]
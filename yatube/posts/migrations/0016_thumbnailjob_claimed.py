@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thumbnailjob',
+            name='claimed',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,104 @@
+import re
+
+from django.db import connection
+
+FTS_TABLE = 'posts_post_fts'
+TRIGGERS = {
+    'posts_post_fts_ai': (
+        'AFTER INSERT ON posts_post BEGIN '
+        'INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text); '
+        'END'
+    ),
+    'posts_post_fts_ad': (
+        'AFTER DELETE ON posts_post BEGIN '
+        "INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+        "VALUES ('delete', old.id, old.text); "
+        'END'
+    ),
+    'posts_post_fts_au': (
+        'AFTER UPDATE OF text ON posts_post BEGIN '
+        "INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+        "VALUES ('delete', old.id, old.text); "
+        'INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text); '
+        'END'
+    ),
+}
+TOKEN_RE = re.compile(r'\w+')
+OPERATORS = {'AND', 'OR', 'NOT', 'NEAR'}
+
+
+def enabled(conn=connection):
+    return conn.vendor == 'sqlite'
+
+
+def install(conn=connection):
+    """Создаёт FTS5-индекс и триггеры синхронизации, если их нет.
+
+    Пересоздание таблицы posts_post в миграциях SQLite удаляет триггеры,
+    поэтому вызывается и после каждого migrate; индекс при этом
+    перестраивается, только если чего-то не хватало.
+    """
+    if not enabled(conn):
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name = %s "
+            "OR (type = 'trigger' AND tbl_name = 'posts_post')",
+            [FTS_TABLE]
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        if existing >= {FTS_TABLE, *TRIGGERS}:
+            return
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+            "text, content='posts_post', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        for name, body in TRIGGERS.items():
+            cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {body}')
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        )
+
+
+def match_expression(query):
+    """Пользовательский ввод -> безопасный запрос MATCH с префиксами."""
+    return ' '.join(
+        f'"{token}"*' for token in TOKEN_RE.findall(query)
+        if token not in OPERATORS
+    )
+
+
+def filter_posts(queryset, query):
+    """Посты, подходящие под запрос, без изменения порядка."""
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none()
+    if not enabled():
+        return queryset.filter(text__icontains=query)
+    return queryset.extra(
+        where=[
+            f'posts_post.id IN (SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s)'
+        ],
+        params=[expression]
+    )
+
+
+def search_posts(queryset, query):
+    """Посты, отсортированные по релевантности (bm25)."""
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none()
+    if not enabled():
+        return queryset.filter(text__icontains=query).order_by('-pub_date')
+    return queryset.extra(
+        select={'rank': f'bm25({FTS_TABLE})'},
+        tables=[FTS_TABLE],
+        where=[
+            f'{FTS_TABLE}.rowid = posts_post.id',
+            f'{FTS_TABLE} MATCH %s',
+        ],
+        params=[expression],
+        order_by=['rank', '-pub_date'],
+    )
@@ -0,0 +1,190 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import caching, counters, thumbnails, timeline
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def unfollow_prune(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_invalidate_feeds(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    followers = Follow.objects.filter(
+        author_id=instance.author_id
+    ).values_list('user_id', flat=True)
+    group_ids = {
+        instance.group_id, getattr(instance, '_previous_group_id', None)
+    } - {None}
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True
+    ) if group_ids else []
+    caching.invalidate(
+        caching.INDEX_FEED,
+        caching.profile_feed(instance.author.username),
+        caching.post_page(instance.pk),
+        *(caching.group_feed(slug) for slug in slugs),
+        *(caching.follow_feed(user_id) for user_id in followers)
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_invalidate_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.invalidate(caching.post_page(instance.post_id))
+
+
+@receiver(pre_save, sender=Group)
+def group_remember_slug(sender, instance, raw=False, **kwargs):
+    if instance.pk is not None and not raw:
+        instance._previous_slug = Group.objects.filter(
+            pk=instance.pk
+        ).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_invalidate_feed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    slugs = {instance.slug, getattr(instance, '_previous_slug', None)}
+    # slug группы есть в карточках постов на всех лентах
+    caching.invalidate(
+        caching.INDEX_FEED,
+        caching.group_cards(instance.pk),
+        *(caching.group_feed(slug) for slug in slugs if slug)
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_invalidate_feed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.invalidate(
+            caching.follow_feed(instance.user_id),
+            caching.following(instance.user_id)
+        )
+
+
+@receiver(pre_save, sender=User)
+def user_remember_name(sender, instance, raw=False, update_fields=None,
+                       **kwargs):
+    if raw or instance.pk is None:
+        return
+    # вход обновляет только last_login: лишний запрос не нужен
+    if update_fields and not {'first_name', 'last_name'} & set(update_fields):
+        return
+    instance._previous_name = User.objects.filter(
+        pk=instance.pk
+    ).values_list('first_name', 'last_name').first()
+
+
+@receiver(post_save, sender=User)
+def user_invalidate_profile(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    feeds = [caching.profile_feed(instance.username)]
+    previous = getattr(instance, '_previous_name', None)
+    if previous not in (None, (instance.first_name, instance.last_name)):
+        # имя автора есть в карточках его постов на всех лентах
+        slugs = Post.objects.filter(
+            author_id=instance.pk, group__isnull=False
+        ).values_list('group__slug', flat=True).distinct()
+        followers = Follow.objects.filter(
+            author_id=instance.pk
+        ).values_list('user_id', flat=True)
+        feeds += [
+            caching.INDEX_FEED,
+            caching.author_cards(instance.pk),
+            *(caching.group_feed(slug) for slug in slugs),
+            *(caching.follow_feed(user_id) for user_id in followers)
+        ]
+    caching.invalidate(*feeds)
+
+
+@receiver(post_save, sender=User)
+def user_create_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def post_remember_state(sender, instance, raw=False, **kwargs):
+    if instance.pk is not None and not raw:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'image'
+            ).first() or (None, None)
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_count(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.bump_user(instance.author_id, 'posts_count', 1)
+        counters.bump_group(instance.group_id, 1)
+        return
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if previous_group_id != instance.group_id:
+        counters.bump_group(previous_group_id, -1)
+        counters.bump_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_uncount(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'posts_count', -1)
+    counters.bump_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_count(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_uncount(sender, instance, **kwargs):
+    counters.bump_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_count(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_user(instance.author_id, 'followers_count', 1)
+        counters.bump_user(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_uncount(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'followers_count', -1)
+    counters.bump_user(instance.user_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def post_enqueue_thumbnails(sender, instance, created, raw=False, **kwargs):
+    if raw or not instance.image:
+        return
+    if created or instance.image.name != getattr(
+        instance, '_previous_image', None
+    ):
+        thumbnails.enqueue([instance.pk])
@@ -0,0 +1,34 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts.caching import post_card_keys
+
+register = template.Library()
+
+CARD_TEMPLATE = 'includes/post_index_follow.html'
+
+
+@register.simple_tag
+def post_cards(posts):
+    """HTML карточек страницы: один get_many, рендер только промахов.
+
+    {% post_cards page_obj as cards %}{% for card in cards %}...
+    """
+    posts = list(posts)
+    keys = post_card_keys(posts)
+    found = cache.get_many(keys)
+    rendered = {}
+    cards = []
+    for key, post in zip(keys, posts):
+        card = found.get(key)
+        if card is None:
+            card = rendered[key] = render_to_string(
+                CARD_TEMPLATE, {'post': post}
+            )
+        cards.append(mark_safe(card))
+    if rendered:
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+    return cards
@@ -0,0 +1,11 @@
+from django import template
+
+from posts.forms import CommentForm
+
+register = template.Library()
+
+
+@register.simple_tag
+def comment_form():
+    """Пустая форма комментария для фрагмента, рендерящегося отдельно."""
+    return CommentForm()
@@ -0,0 +1,286 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from .. import thumbnails
+from ..models import (Comment, Follow, Group, Post, ThumbnailJob, Timeline,
+                      UserStats)
+from ..thumbnails import VARIANTS
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+User = get_user_model()
+
+
+class ReconcileCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост', group=cls.group
+        )
+        Comment.objects.create(post=cls.post, author=cls.reader, text='Да')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def reconcile(self, *args):
+        out = StringIO()
+        call_command('reconcile_counters', '--chunk-size=1', *args, stdout=out)
+        return out.getvalue()
+
+    def test_drift_is_fixed(self):
+        UserStats.objects.filter(user=self.author).update(
+            posts_count=7, followers_count=0
+        )
+        Group.objects.update(posts_count=3)
+        Post.objects.update(comments_count=0)
+        UserStats.objects.filter(user=self.reader).delete()
+        out = self.reconcile()
+        self.assertIn('users: проверено 2, расхождений 1', out)
+        author_stats = UserStats.objects.get(user=self.author)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 1
+        )
+        self.assertEqual(Group.objects.get().posts_count, 1)
+        self.assertEqual(Post.objects.get().comments_count, 1)
+
+    def test_dry_run_writes_nothing(self):
+        Group.objects.update(posts_count=3)
+        out = self.reconcile('--dry-run')
+        self.assertIn('groups: проверено 1, расхождений 1', out)
+        self.assertEqual(Group.objects.get().posts_count, 3)
+
+    def test_consistent_counters_untouched(self):
+        out = self.reconcile()
+        self.assertNotIn('расхождений 1', out)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailQueueTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+
+    def create_post(self, **kwargs):
+        return Post.objects.create(author=self.author, text='Пост', **kwargs)
+
+    def test_post_with_image_is_queued_once(self):
+        post = self.create_post(image=SimpleUploadedFile(
+            'small.gif', SMALL_GIF, content_type='image/gif'
+        ))
+        self.create_post()
+        post.text = 'Правка'
+        post.save()
+        self.assertEqual(
+            list(ThumbnailJob.objects.values_list('post_id', flat=True)),
+            [post.pk]
+        )
+
+    def test_worker_builds_all_variants(self):
+        post = self.create_post(image=SimpleUploadedFile(
+            'small.gif', SMALL_GIF, content_type='image/gif'
+        ))
+        call_command('thumbnail_worker', '--once', stdout=StringIO())
+        self.assertFalse(ThumbnailJob.objects.exists())
+        thumbnails = default.kvstore._get(
+            ImageFile(post.image).key, identity='thumbnails'
+        )
+        self.assertEqual(len(thumbnails), len(VARIANTS))
+
+    def test_claimed_job_is_not_taken_twice(self):
+        post = self.create_post(image=SimpleUploadedFile(
+            'small.gif', SMALL_GIF, content_type='image/gif'
+        ))
+        self.assertEqual(
+            [job.post_id for job in thumbnails.claim(10)], [post.pk]
+        )
+        # второй воркер не видит чужое задание, пока не истёк срок
+        self.assertEqual(thumbnails.process(10), 0)
+        ThumbnailJob.objects.update(
+            claimed=timezone.now() - thumbnails.CLAIM_TIMEOUT * 2
+        )
+        self.assertEqual(thumbnails.process(10), 1)
+        self.assertFalse(ThumbnailJob.objects.exists())
+
+    def test_backfill_queues_existing_posts(self):
+        post = self.create_post(image=SimpleUploadedFile(
+            'small.gif', SMALL_GIF, content_type='image/gif'
+        ))
+        self.create_post()
+        ThumbnailJob.objects.all().delete()
+        call_command(
+            'backfill_thumbnails', '--chunk-size=1', stdout=StringIO()
+        )
+        self.assertEqual(
+            list(ThumbnailJob.objects.values_list('post_id', flat=True)),
+            [post.pk]
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageMetadataBackfillTest(TestCase):
+    def test_backfill_fills_metadata(self):
+        author = User.objects.create_user(username='author')
+        post = Post.objects.create(
+            author=author, text='Пост', image=SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif'
+            )
+        )
+        Post.objects.create(author=author, text='Без картинки')
+        Post.objects.create(author=author, text='Нет файла', image='no.gif')
+        out = StringIO()
+        call_command(
+            'backfill_image_metadata', '--chunk-size=2', stdout=out
+        )
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertEqual(post.image_size, len(SMALL_GIF))
+        self.assertIn('Заполнено: 1, файлов не найдено: 1', out.getvalue())
+
+
+class ImportPostsTest(TestCase):
+    def write(self, suffix, content):
+        file = tempfile.NamedTemporaryFile(
+            'w', suffix=suffix, delete=False, encoding='utf-8'
+        )
+        with file:
+            file.write(content)
+        self.addCleanup(os.remove, file.name)
+        return file.name
+
+    def import_file(self, path, *args):
+        out = StringIO()
+        call_command('import_posts', path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_jsonl_import(self):
+        reader = User.objects.create_user(username='reader')
+        records = [
+            {'type': 'group', 'slug': 'news', 'title': 'Новости'},
+            {'type': 'follow', 'user': 'reader', 'author': 'writer'},
+            {'text': 'Первый', 'author': 'writer', 'group': 'news',
+             'pub_date': '2015-03-01T10:00:00+00:00'},
+            {'text': 'Второй', 'author': 'writer'},
+            {'text': 'Новый автор', 'author': 'ghost'},
+            {'type': 'comment', 'text': '?'},
+        ]
+        path = self.write(
+            '.jsonl', '\n'.join(json.dumps(record) for record in records)
+        )
+        out = self.import_file(
+            path, '--batch-size=2', '--create-users'
+        )
+        self.assertIn('посты 3', out)
+        writer = User.objects.get(username='writer')
+        self.assertEqual(writer.posts.count(), 2)
+        self.assertTrue(User.objects.filter(username='ghost').exists())
+        first = writer.posts.get(text='Первый')
+        self.assertEqual(first.group.slug, 'news')
+        self.assertEqual(first.pub_date.year, 2015)
+        self.assertEqual(Group.objects.get(slug='news').posts_count, 1)
+        self.assertEqual(UserStats.objects.get(user=writer).posts_count, 2)
+        self.assertEqual(
+            Timeline.objects.filter(user=reader).count(), 2
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=reader).following_count, 1
+        )
+
+    def test_csv_import_skips_unknown_authors(self):
+        User.objects.create_user(username='writer')
+        path = self.write(
+            '.csv', 'type,text,author\npost,Текст,writer\npost,Ещё,ghost\n'
+        )
+        out = self.import_file(path)
+        self.assertIn('посты 1', out)
+        self.assertIn('пропущено 1', out)
+        self.assertFalse(User.objects.filter(username='ghost').exists())
+
+    def test_bad_date_skips_only_its_record(self):
+        User.objects.create_user(username='writer')
+        records = [
+            {'text': f'Пост {i}', 'author': 'writer',
+             'pub_date': '2020-13-01T00:00' if i == 2 else '2020-01-01'}
+            for i in range(5)
+        ]
+        path = self.write(
+            '.jsonl', '\n'.join(json.dumps(record) for record in records)
+        )
+        out = self.import_file(path, '--batch-size=2')
+        self.assertIn('посты 4', out)
+        self.assertIn('пропущено 1', out)
+        self.assertFalse(Post.objects.filter(text='Пост 2').exists())
+        self.assertTrue(Post.objects.filter(text='Пост 4').exists())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedBenchTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def seed(self, *args):
+        call_command(
+            'seed_bench', '--users=30', '--groups=3', '--posts=300',
+            '--comments=200', '--follows=4', *args, stdout=StringIO()
+        )
+
+    def test_population_is_consistent(self):
+        self.seed('--images=2')
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 200)
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        self.assertEqual(
+            Timeline.objects.count(),
+            Post.objects.filter(author__following__isnull=False).count()
+        )
+        top = UserStats.objects.order_by('-posts_count').first()
+        self.assertEqual(top.posts_count, top.user.posts.count())
+        # распределение по авторам скошено
+        self.assertGreater(top.posts_count, 300 / 30 * 2)
+        self.assertEqual(ThumbnailJob.objects.count(), 2)
+        post = Post.objects.exclude(image='').first()
+        self.assertTrue(post.image_width and post.image_hash)
+
+    def test_same_seed_same_data(self):
+        self.seed('--prefix=a')
+        self.seed('--prefix=b')
+        posts = [
+            list(Post.objects.filter(
+                author__username__startswith=prefix
+            ).order_by('pk').values_list('text', 'author__username'))
+            for prefix in ('a-', 'b-')
+        ]
+        self.assertEqual(
+            [(text, name[2:]) for text, name in posts[0]],
+            [(text, name[2:]) for text, name in posts[1]],
+        )
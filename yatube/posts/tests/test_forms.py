@@ -1,3 +1,4 @@
+import hashlib
 import tempfile
 from http import HTTPStatus
 
@@ -72,6 +73,11 @@ class FormTest(TestCase):
         self.assertEqual(post_1.text, form_data['text'])
         self.assertEqual(post_1.group.id, form_data['group'])
         self.assertEqual(post_1.image.name, 'posts/' + form_data['image'].name)
+        self.assertEqual((post_1.image_width, post_1.image_height), (2, 1))
+        self.assertEqual(post_1.image_size, len(small_gif))
+        self.assertEqual(
+            post_1.image_hash, hashlib.sha256(small_gif).hexdigest()
+        )
 
     def test_authorized_edit_post(self):
         form_data = {
@@ -1,7 +1,9 @@
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from ..models import Group, Post
+from ..models import Comment, Follow, Group, Post, UserStats
 
 User = get_user_model()
 
@@ -40,3 +42,82 @@ class PostModelTest(TestCase):
         post = PostModelTest.post
         text = post._meta.get_field('group').help_text
         self.assertEqual(text, 'Группа, к которой будет относиться пост')
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(title='Группа', slug='group')
+        self.other_group = Group.objects.create(title='Другая', slug='other')
+
+    def assertCounter(self, obj, field, expected):
+        obj.refresh_from_db()
+        self.assertEqual(getattr(obj, field), expected)
+
+    def test_post_counters(self):
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        self.assertCounter(self.author.stats, 'posts_count', 1)
+        self.assertCounter(self.group, 'posts_count', 1)
+        post.group = self.other_group
+        post.save()
+        self.assertCounter(self.group, 'posts_count', 0)
+        self.assertCounter(self.other_group, 'posts_count', 1)
+        post.delete()
+        self.assertCounter(self.author.stats, 'posts_count', 0)
+        self.assertCounter(self.other_group, 'posts_count', 0)
+
+    def test_comment_counter(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий'
+        )
+        self.assertCounter(post, 'comments_count', 1)
+        comment.delete()
+        self.assertCounter(post, 'comments_count', 0)
+
+    def test_follow_counters(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertCounter(self.author.stats, 'followers_count', 1)
+        self.assertCounter(self.reader.stats, 'following_count', 1)
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertCounter(self.author.stats, 'followers_count', 0)
+        self.assertCounter(self.reader.stats, 'following_count', 0)
+
+    def test_missing_stats_are_recounted(self):
+        Post.objects.create(author=self.author, text='Пост')
+        UserStats.objects.filter(user=self.author).delete()
+        Post.objects.create(author=self.author, text='Ещё пост')
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 2
+        )
+
+    def test_decrement_keeps_zero_without_recount(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        UserStats.objects.filter(user=self.author).update(posts_count=0)
+        with CaptureQueriesContext(connection) as queries:
+            post.delete()
+        self.assertFalse([
+            query['sql'] for query in queries.captured_queries
+            if 'COUNT(' in query['sql']
+        ])
+        self.assertCounter(self.author.stats, 'posts_count', 0)
+
+    def test_delete_user_with_content(self):
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        other_post = Post.objects.create(author=self.reader, text='Пост')
+        Comment.objects.create(post=post, author=self.reader, text='Да')
+        Comment.objects.create(post=other_post, author=self.author, text='Да')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.author, author=self.reader)
+        self.author.delete()
+        self.assertFalse(UserStats.objects.filter(user=self.author).exists())
+        self.assertCounter(self.reader.stats, 'followers_count', 0)
+        self.assertCounter(self.reader.stats, 'following_count', 0)
+        self.assertCounter(self.reader.stats, 'posts_count', 1)
+        self.assertCounter(other_post, 'comments_count', 0)
+        self.assertCounter(self.group, 'posts_count', 0)
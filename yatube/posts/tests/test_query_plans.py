@@ -0,0 +1,94 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from ..utils import encode_cursor
+
+User = get_user_model()
+
+# полный проход таблицы без индекса или сортировка во временном B-дереве;
+# проход подзапроса с LIMIT (ограниченный COUNT пагинатора) допустим
+BAD_PLAN = re.compile(
+    r'SCAN (TABLE )?(?!subquery)\w+$|USE TEMP B-TREE'
+)
+
+
+class QueryPlanTests(TestCase):
+    """EXPLAIN QUERY PLAN каждого запроса горячих страниц."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(15):
+            post = Post.objects.create(
+                author=cls.author, text=f'Пост {i}', group=cls.group
+            )
+        cls.post = post
+        for i in range(25):
+            Comment.objects.create(
+                post=post, author=cls.user, text=f'Комментарий {i}'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def plans(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, params)
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or 'posts_' not in sql:
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                yield sql, [row[-1] for row in cursor.fetchall()]
+
+    def assert_indexed(self, url, params=None):
+        checked = 0
+        for sql, plan in self.plans(url, params):
+            checked += 1
+            bad = [step for step in plan if BAD_PLAN.search(step)]
+            self.assertFalse(bad, f'{sql}\n' + '\n'.join(plan))
+        self.assertGreater(checked, 0)
+
+    def test_hot_queries_use_indexes(self):
+        cursor = encode_cursor(Post.objects.order_by('pk')[5])
+        comment_cursor = encode_cursor(
+            Comment.objects.order_by('pk')[5], date_attr='created'
+        )
+        detail = reverse('posts:post_detail', args=(self.post.pk,))
+        pages = (
+            (reverse('posts:index'), None),
+            (reverse('posts:index'), {'cursor': cursor}),
+            (reverse('posts:index'), {'page': 2}),
+            (reverse('posts:group_list', args=(self.group.slug,)), None),
+            (
+                reverse('posts:group_list', args=(self.group.slug,)),
+                {'cursor': cursor},
+            ),
+            (reverse('posts:profile', args=(self.author.username,)), None),
+            (
+                reverse('posts:profile', args=(self.author.username,)),
+                {'cursor': cursor},
+            ),
+            (reverse('posts:follow_index'), None),
+            (reverse('posts:follow_index'), {'cursor': cursor}),
+            (detail, None),
+            (detail, {'cursor': comment_cursor}),
+            (detail, {'order': 'new'}),
+        )
+        for url, params in pages:
+            with self.subTest(url=url, params=params):
+                self.assert_indexed(url, params)
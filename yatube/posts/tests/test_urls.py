@@ -1,6 +1,7 @@
 from http import HTTPStatus
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import Client, TestCase
 
 from ..models import Group, Post
@@ -25,6 +26,9 @@ class StaticURLTests(TestCase):
             slug='test_slug'
         )
 
+    def setUp(self):
+        cache.clear()
+
     def test_urls_correct_name_auth_users(self):
         template_urls_auth_users = {
             '/': 'posts/index.html',
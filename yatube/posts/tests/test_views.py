@@ -1,19 +1,32 @@
+import base64
 import tempfile
+from http import HTTPStatus
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.shortcuts import get_object_or_404
-from django.test import Client, TestCase
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Comment, Follow, Group, Post
+from core.decorators import QueryBudgetExceeded, query_budget
+
+from ..caching import post_card_key
+from ..following import followed_authors, is_following
+from ..models import Comment, Follow, Group, Post, Timeline, UserStats
+from ..utils import CursorPaginator, WindowedPaginator, decode_cursor
 
 User = get_user_model()
 
 
+def forged_cursor(raw):
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
 class ViewsTestContext(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -59,6 +72,7 @@ class ViewsTestContext(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(username='TestName')
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -213,10 +227,25 @@ class PaginatorViewsTest(TestCase):
             )
         cls.count_posts = Post.objects.count()
 
+    def setUp(self):
+        cache.clear()
+
     def test_paginator_index_first_page(self):
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(len(response.context['page_obj']), settings.COUNTLIST)
 
+    def test_out_of_range_cursor_returns_first_page(self):
+        for pk in (2 ** 63, 2 ** 70, 0, -1):
+            cursor = forged_cursor(f'n|2020-01-01T00:00:00|{pk}')
+            with self.subTest(pk=pk):
+                self.assertIsNone(decode_cursor(cursor))
+                response = self.authorized_client.get(
+                    reverse('posts:index'), {'cursor': cursor}
+                )
+                self.assertEqual(
+                    len(response.context['page_obj']), settings.COUNTLIST
+                )
+
     def test_paginator_index_second_page(self):
         response = self.authorized_client.get(reverse(
             'posts:index'
@@ -268,6 +297,350 @@ class PaginatorViewsTest(TestCase):
             self.count_posts - settings.COUNTLIST
         )
 
+    def test_cursor_pages_walk_forward_and_back(self):
+        response = self.authorized_client.get(reverse('posts:index'))
+        first_page = response.context['page_obj']
+        first_ids = [post.id for post in first_page]
+        self.assertEqual(len(first_ids), settings.COUNTLIST)
+        self.assertFalse(first_page.has_previous())
+        self.assertTrue(first_page.has_next())
+        response = self.authorized_client.get(
+            reverse('posts:index'),
+            {'cursor': first_page.paginator.next_cursor}
+        )
+        second_page = response.context['page_obj']
+        self.assertEqual(
+            len(second_page), self.count_posts - settings.COUNTLIST
+        )
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(set(first_ids).isdisjoint(
+            post.id for post in second_page
+        ))
+        response = self.authorized_client.get(
+            reverse('posts:index'),
+            {'cursor': second_page.paginator.previous_cursor}
+        )
+        self.assertEqual(
+            [post.id for post in response.context['page_obj']], first_ids
+        )
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_cursor_page_does_not_count(self):
+        page_obj = CursorPaginator(
+            Post.objects.all(), settings.COUNTLIST
+        ).page()
+        with self.assertNumQueries(1):
+            list(page_obj)
+            page_obj.has_next()
+            page_obj.paginator.next_cursor
+
+    def test_broken_cursor_returns_first_page(self):
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'cursor': 'garbage!'}
+        )
+        self.assertEqual(len(response.context['page_obj']), settings.COUNTLIST)
+
+
+class WindowedPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='Author')
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Пост {i}') for i in range(60)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_window_is_elided(self):
+        paginator = WindowedPaginator(Post.objects.order_by('pk'), 2)
+        ellipsis = WindowedPaginator.ELLIPSIS
+        self.assertEqual(
+            paginator.page(15).page_window,
+            [1, ellipsis, 13, 14, 15, 16, 17, ellipsis, 30]
+        )
+        self.assertEqual(
+            paginator.page(2).page_window,
+            [1, 2, 3, 4, ellipsis, 30]
+        )
+        self.assertEqual(
+            WindowedPaginator(Post.objects.order_by('pk'), 10).page(
+                3
+            ).page_window,
+            [1, 2, 3, 4, 5, 6]
+        )
+
+    @override_settings(PAGINATOR_EXACT_COUNT=20)
+    def test_count_above_threshold_is_estimated_or_cached(self):
+        posts = Post.objects.order_by('pk')
+        self.assertEqual(WindowedPaginator(posts, 10, estimate=100).count, 100)
+        paginator = WindowedPaginator(posts, 10, count_key='test')
+        self.assertEqual(paginator.count, 60)
+        self.assertTrue(paginator.approximate)
+        Post.objects.filter(pk__in=posts.values('pk')[:10]).delete()
+        self.assertEqual(
+            WindowedPaginator(posts, 10, count_key='test').count, 60
+        )
+        small = WindowedPaginator(posts, 10, estimate=1000)
+        with override_settings(PAGINATOR_EXACT_COUNT=100):
+            self.assertEqual(small.count, 50)
+
+    @override_settings(COUNTLIST=2)
+    def test_page_links_do_not_grow_with_table(self):
+        response = self.client.get(reverse('posts:index'), {'page': 15})
+        # первая, предыдущая, окно из 9 элементов, следующая, последняя
+        self.assertEqual(
+            response.content.decode().count('class="page-item'), 13
+        )
+
+
+@override_settings(COMMENTS_PER_PAGE=5)
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='Author')
+        cls.post = Post.objects.create(author=author, text='Пост')
+        for i in range(12):
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.create_user(username=f'Reader{i}'),
+                text=f'Комментарий {i}'
+            )
+        cls.url = reverse('posts:post_detail', args=(cls.post.pk,))
+
+    def setUp(self):
+        cache.clear()
+
+    def texts(self, page):
+        return [comment.text for comment in page]
+
+    def test_oldest_first_by_default(self):
+        page = self.client.get(self.url).context['comments']
+        self.assertEqual(
+            self.texts(page), [f'Комментарий {i}' for i in range(5)]
+        )
+        page = self.client.get(
+            self.url, {'cursor': page.paginator.next_cursor}
+        ).context['comments']
+        self.assertEqual(
+            self.texts(page), [f'Комментарий {i}' for i in range(5, 10)]
+        )
+        page = self.client.get(
+            self.url, {'cursor': page.paginator.previous_cursor}
+        ).context['comments']
+        self.assertEqual(self.texts(page)[0], 'Комментарий 0')
+
+    def test_newest_first_switch(self):
+        response = self.client.get(self.url, {'order': 'new'})
+        page = response.context['comments']
+        self.assertEqual(
+            self.texts(page), [f'Комментарий {i}' for i in range(11, 6, -1)]
+        )
+        self.assertContains(response, 'order=new&amp;cursor=')
+
+    def test_out_of_range_cursor_returns_first_page(self):
+        cursor = forged_cursor(f'n|2020-01-01T00:00:00|{2 ** 64}')
+        for order, first in (('old', 0), ('new', 11)):
+            with self.subTest(order=order):
+                response = self.client.get(
+                    self.url, {'order': order, 'cursor': cursor}
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(
+                    self.texts(response.context['comments'])[0],
+                    f'Комментарий {first}'
+                )
+
+    def test_queries_do_not_depend_on_thread_size(self):
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.post.author, text='Ещё')
+            for _ in range(50)
+        )
+        cache.clear()
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestName')
+        cls.group = Group.objects.create(title='Test title', slug='test_slug')
+        for i in range(13):
+            author = User.objects.create_user(username=f'Author{i}')
+            Follow.objects.create(user=cls.user, author=author)
+            cls.post = Post.objects.create(
+                author=author, text=f'Test text{i}', group=cls.group
+            )
+            Comment.objects.create(post=cls.post, author=author, text='Ок')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_feeds_fit_budget(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'Author0'}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        with self.assertNumQueries(4):
+            self.authorized_client.get(reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}
+            ))
+
+    def test_budget_exceeded_raises(self):
+        @query_budget(1)
+        def greedy_view(request):
+            list(User.objects.all())
+            list(Post.objects.all())
+
+        request = RequestFactory().get('/')
+        with self.assertRaises(QueryBudgetExceeded):
+            greedy_view(request)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestName', is_staff=True,
+                                            is_superuser=True)
+        cls.cat = Post.objects.create(
+            author=cls.user, text='Кошка ловит мышей, кошка спит'
+        )
+        cls.dog = Post.objects.create(
+            author=cls.user, text='Собака и кошка гуляют'
+        )
+        Post.objects.create(author=cls.user, text='Про погоду')
+
+    def search(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_search_is_ranked(self):
+        self.assertEqual(self.search('кошка'), [self.cat.pk, self.dog.pk])
+
+    def test_search_prefix_and_syntax_safe(self):
+        self.assertEqual(self.search('соба'), [self.dog.pk])
+        self.assertEqual(self.search('"кошка" AND ('), [
+            self.cat.pk, self.dog.pk
+        ])
+        self.assertEqual(self.search(''), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        dog = Post.objects.get(pk=self.dog.pk)
+        dog.text = 'Собака гуляет одна'
+        dog.save()
+        self.assertEqual(self.search('кошка'), [self.cat.pk])
+        Post.objects.get(pk=self.cat.pk).delete()
+        self.assertEqual(self.search('кошка'), [])
+
+    def test_admin_search_uses_index(self):
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собака'}
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['cl'].result_list],
+            [self.dog.pk]
+        )
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(title='Test title', slug='test_slug')
+        cls.post = Post.objects.create(
+            author=cls.author, text='Test text', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def revalidate(self, url, client=None):
+        client = client or self.client
+        first = client.get(url)
+        self.assertEqual(first.status_code, HTTPStatus.OK)
+        return client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+    def test_unchanged_pages_are_not_modified(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'Author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.revalidate(url)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+
+    def test_anonymous_last_modified(self):
+        url = reverse('posts:index')
+        first = self.client.get(url)
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_new_post_changes_validators(self):
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        first = self.client.get(url)
+        Post.objects.create(author=self.author, text='New', group=self.group)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_comment_changes_post_detail(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        first = self.client.get(url)
+        Comment.objects.create(post=self.post, author=self.author, text='Hi')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertContains(response, 'Hi')
+
+    def test_etag_is_per_user(self):
+        url = reverse('posts:index')
+        first = self.client.get(url)
+        client = Client()
+        client.force_login(self.author)
+        response = client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_follow_changes_profile(self):
+        reader = User.objects.create_user(username='Reader')
+        client = Client()
+        client.force_login(reader)
+        url = reverse('posts:profile', kwargs={'username': 'Author'})
+        first = client.get(url)
+        client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'Author'}
+        ))
+        response = client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertContains(response, reverse(
+            'posts:profile_unfollow', kwargs={'username': 'Author'}
+        ))
+
 
 class CacheTests(TestCase):
     @classmethod
@@ -284,6 +657,7 @@ class CacheTests(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(username='TestName')
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -292,9 +666,7 @@ class CacheTests(TestCase):
         first_state = self.authorized_client.get(reverse(
             'posts:index'
         ))
-        post_0 = get_object_or_404(Post, pk=self.post.pk)
-        post_0.text = 'Test text2'
-        post_0.save()
+        Post.objects.filter(pk=self.post.pk).update(text='Test text2')
         second_state = self.authorized_client.get(reverse(
             'posts:index'
         ))
@@ -304,6 +676,31 @@ class CacheTests(TestCase):
             'posts:index'))
         self.assertNotEqual(first_state.content, third_state.content)
 
+    def test_cache_index_invalidated_on_save(self):
+        first_state = self.authorized_client.get(reverse('posts:index'))
+        post_0 = get_object_or_404(Post, pk=self.post.pk)
+        post_0.text = 'Test text2'
+        post_0.save()
+        second_state = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotEqual(first_state.content, second_state.content)
+        self.assertContains(second_state, 'Test text2')
+
+    def test_cached_index_skips_feed_query(self):
+        self.client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('posts:index'))
+
+    def test_cache_follow_per_user(self):
+        Follow.objects.create(user=self.user, author=self.post.author)
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertContains(response, self.post.text)
+        other_client = Client()
+        other_client.force_login(
+            User.objects.create_user(username='Stranger')
+        )
+        response = other_client.get(reverse('posts:follow_index'))
+        self.assertNotContains(response, self.post.text)
+
 
 class FollowTest(TestCase):
     def setUp(self):
@@ -362,3 +759,205 @@ class FollowTest(TestCase):
             'posts:follow_index'
         ))
         self.assertNotContains(response, self.post.text)
+
+    def test_timeline_follows_subscriptions(self):
+        self.authorized_client_follower.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.user_following.username}
+        ))
+        self.assertTrue(Timeline.objects.filter(
+            user=self.user_follower, post=self.post
+        ).exists())
+        new_post = Post.objects.create(
+            author=self.user_following,
+            text='Fresh post'
+        )
+        self.assertEqual(
+            Timeline.objects.get(
+                user=self.user_follower, post=new_post
+            ).pub_date,
+            new_post.pub_date
+        )
+        self.authorized_client_follower.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.user_following.username}
+        ))
+        self.assertFalse(
+            Timeline.objects.filter(user=self.user_follower).exists()
+        )
+
+    def test_follow_is_idempotent_single_write(self):
+        url = reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.user_following.username}
+        )
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as queries:
+                self.authorized_client_follower.get(url)
+            follow_queries = [
+                query['sql'] for query in queries.captured_queries
+                if 'posts_follow' in query['sql']
+            ]
+            self.assertEqual(len(follow_queries), 1, follow_queries)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.user_following).followers_count,
+            1
+        )
+
+    def test_follow_self_and_unknown_are_ignored(self):
+        for username in (self.user_follower.username, 'ghost'):
+            self.authorized_client_follower.get(reverse(
+                'posts:profile_follow', kwargs={'username': username}
+            ))
+        self.assertFalse(Follow.objects.exists())
+
+    def test_unfollow_is_single_write(self):
+        Follow.objects.create(
+            user=self.user_follower, author=self.user_following
+        )
+        url = reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.user_following.username}
+        )
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as queries:
+                self.authorized_client_follower.get(url)
+            follow_queries = [
+                query['sql'] for query in queries.captured_queries
+                if 'posts_follow' in query['sql']
+            ]
+            self.assertEqual(len(follow_queries), 1, follow_queries)
+        self.assertFalse(Timeline.objects.filter(
+            user=self.user_follower
+        ).exists())
+        self.assertEqual(
+            UserStats.objects.get(user=self.user_follower).following_count,
+            0
+        )
+
+
+class FollowedAuthorsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        followed_authors.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def follow_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [
+            query['sql'] for query in queries.captured_queries
+            if 'posts_follow' in query['sql']
+        ]
+
+    def test_profile_reads_follow_state_from_memory(self):
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        author = self.authors[0].username
+        response, queries = self.follow_queries(
+            reverse('posts:profile', args=(author,))
+        )
+        self.assertNotIn('following', response.context)
+        self.assertContains(
+            response, reverse('posts:profile_unfollow', args=(author,))
+        )
+        self.assertEqual(len(queries), 1)
+        author = self.authors[1].username
+        response, queries = self.follow_queries(
+            reverse('posts:profile', args=(author,))
+        )
+        self.assertContains(
+            response, reverse('posts:profile_follow', args=(author,))
+        )
+        self.assertEqual(queries, [])
+
+    def test_follow_and_unfollow_update_set(self):
+        author = self.authors[1]
+        self.assertFalse(is_following(self.reader, author.pk))
+        self.client.get(
+            reverse('posts:profile_follow', args=(author.username,))
+        )
+        self.assertTrue(is_following(self.reader, author.pk))
+        self.client.get(
+            reverse('posts:profile_unfollow', args=(author.username,))
+        )
+        self.assertFalse(is_following(self.reader, author.pk))
+
+    @override_settings(FOLLOWING_CACHE_USER_LIMIT=2)
+    def test_huge_follow_list_falls_back_to_query(self):
+        for author in self.authors:
+            Follow.objects.create(user=self.reader, author=author)
+        self.assertIsNone(followed_authors.get(self.reader.pk))
+        self.assertTrue(is_following(self.reader, self.authors[2].pk))
+
+    @override_settings(FOLLOWING_CACHE_MAX_IDS=2)
+    def test_least_recently_used_evicted(self):
+        for author in self.authors:
+            Follow.objects.create(user=author, author=self.reader)
+            followed_authors.get(author.pk)
+        self.assertEqual(
+            list(followed_authors.entries),
+            [self.authors[1].pk, self.authors[2].pk]
+        )
+        self.assertLessEqual(followed_authors.size, 2)
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.author, text='Исходный текст', group=self.group
+        )
+
+    def test_card_shared_between_feeds(self):
+        self.client.get(reverse('posts:group_list', args=('group',)))
+        key = post_card_key(self.post)
+        self.assertIn('Исходный текст', cache.get(key))
+        cache.set(key, 'карточка из кэша')
+        response = self.client.get(
+            reverse('posts:profile', args=(self.author.username,))
+        )
+        self.assertContains(response, 'карточка из кэша')
+        self.assertNotContains(response, 'Исходный текст')
+
+    def test_edit_changes_card(self):
+        url = reverse('posts:group_list', args=('group',))
+        self.client.get(url)
+        old_key = post_card_key(self.post)
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertNotEqual(post_card_key(self.post), old_key)
+        response = self.client.get(url)
+        self.assertContains(response, 'Новый текст')
+        self.assertNotContains(response, 'Исходный текст')
+
+    def test_group_and_author_changes_change_card(self):
+        url = reverse('posts:index')
+        self.client.get(url)
+        self.group.slug = 'renamed'
+        self.group.save()
+        self.assertContains(
+            self.client.get(url),
+            reverse('posts:group_list', args=('renamed',))
+        )
+        self.author.first_name = 'Новое'
+        self.author.last_name = 'Имя'
+        self.author.save()
+        self.assertContains(self.client.get(url), 'Новое Имя')
+        self.group.delete()
+        self.assertNotContains(self.client.get(url), 'все записи группы')
@@ -0,0 +1,76 @@
+import logging
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from sorl.thumbnail import get_thumbnail
+
+from .models import ThumbnailJob
+
+logger = logging.getLogger(__name__)
+
+# Все варианты, которые запрашивают шаблоны через {% thumbnail %}
+VARIANTS = (
+    ('960x339', {'upscale': True}),
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+MAX_ATTEMPTS = 3
+# после этого срока задание упавшего воркера можно забрать снова
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def enqueue(post_ids):
+    """Ставит посты в очередь; повторная постановка игнорируется.
+
+    Вызывается из сигнала сохранения поста, а представления сохраняют
+    пост в transaction.atomic: воркер не увидит задание раньше поста.
+    """
+    ThumbnailJob.objects.bulk_create(
+        (ThumbnailJob(post_id=pk) for pk in post_ids),
+        ignore_conflicts=True
+    )
+
+
+def generate(post):
+    for geometry, options in VARIANTS:
+        get_thumbnail(post.image, geometry, **options)
+
+
+def claim(batch_size):
+    """Забирает до batch_size свободных заданий.
+
+    Владельца решает условный UPDATE: из нескольких воркеров строку
+    обновит только один, остальные получат rowcount 0.
+    """
+    now = timezone.now()
+    free = Q(claimed__isnull=True) | Q(claimed__lt=now - CLAIM_TIMEOUT)
+    candidates = ThumbnailJob.objects.filter(free).order_by(
+        'created'
+    ).values_list('pk', flat=True)[:batch_size]
+    claimed = [
+        pk for pk in list(candidates)
+        if ThumbnailJob.objects.filter(free, pk=pk).update(claimed=now)
+    ]
+    return list(ThumbnailJob.objects.filter(pk__in=claimed).select_related(
+        'post'
+    ).order_by('created'))
+
+
+def process(batch_size):
+    """Обрабатывает одну пачку заданий, возвращает их количество."""
+    jobs = claim(batch_size)
+    for job in jobs:
+        try:
+            if job.post.image:
+                generate(job.post)
+        except Exception:
+            logger.exception(
+                'Не удалось построить превью поста %s', job.post_id
+            )
+            job.attempts += 1
+            if job.attempts < MAX_ATTEMPTS:
+                job.claimed = None
+                job.save(update_fields=('attempts', 'claimed'))
+                continue
+        job.delete()
+    return len(jobs)
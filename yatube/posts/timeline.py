@@ -0,0 +1,85 @@
+from itertools import islice
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Follow, Post, Timeline
+
+BATCH_SIZE = 500
+
+
+def _insert(entries):
+    entries = iter(entries)
+    batch = list(islice(entries, BATCH_SIZE))
+    while batch:
+        Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+        batch = list(islice(entries, BATCH_SIZE))
+
+
+def fan_out(post):
+    """Раскладывает новый пост в ленты всех подписчиков автора."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _insert(
+        Timeline(user_id=user_id, post_id=post.pk, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def fan_out_many(posts):
+    """То же для пачки (pk, author_id, pub_date), одним запросом подписок."""
+    followers = {}
+    authors = {author_id for _, author_id, _ in posts}
+    for user_id, author_id in Follow.objects.filter(
+        author_id__in=authors
+    ).values_list('user_id', 'author_id').iterator():
+        followers.setdefault(author_id, []).append(user_id)
+    _insert(
+        Timeline(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for pk, author_id, pub_date in posts
+        for user_id in followers.get(author_id, ())
+    )
+
+
+def backfill(user_id, author_id):
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')
+    _insert(
+        Timeline(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for pk, pub_date in posts.iterator()
+    )
+
+
+def rebuild():
+    """Добавляет недостающие записи лент по всем подпискам одним запросом.
+
+    Для массовой загрузки, когда fan_out по каждой подписке слишком долог.
+    """
+    entry, follow, post = (
+        model._meta.db_table for model in (Timeline, Follow, Post)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {entry} (user_id, post_id, pub_date) '
+            f'SELECT f.user_id, p.id, p.pub_date FROM {follow} f '
+            f'JOIN {post} p ON p.author_id = f.author_id '
+            f'WHERE NOT EXISTS (SELECT 1 FROM {entry} t '
+            f'WHERE t.user_id = f.user_id AND t.post_id = p.id)'
+        )
+
+
+def prune(user_id, author_id):
+    Timeline.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def feed_keyset(user):
+    """Параметры keyset-пагинации ленты подписок по индексу Timeline."""
+    return {
+        'scope': Q(timeline_entries__user=user),
+        'date_field': 'timeline_entries__pub_date',
+        'id_field': 'timeline_entries__post',
+    }
@@ -1,9 +1,239 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+from contextlib import contextmanager
+from datetime import datetime
+
 from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.functional import SimpleLazyObject, cached_property
+
+from core.stampede import get_or_compute
+
+NEXT = 'n'
+PREV = 'p'
+ELLIPSIS = '…'
+# первичные ключи - знаковые 64-битные целые SQL
+MAX_PK = 2 ** 63 - 1
+
+
+def encode_cursor(obj, direction=NEXT, date_attr='pub_date'):
+    raw = f'{direction}|{getattr(obj, date_attr).isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (direction, pub_date, pk) или None для битого токена."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, pub_date, pk = raw.decode().split('|')
+        pk = int(pk)
+        if direction not in (NEXT, PREV) or not 1 <= pk <= MAX_PK:
+            return None
+        return direction, datetime.fromisoformat(pub_date), pk
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по (pub_date, id).
+
+    Вместо COUNT(*) и OFFSET страница выбирается диапазоном по индексу,
+    поэтому стоимость запроса не зависит от глубины листания.
+    Страница вычисляется лениво, при первом обращении к записям.
+    По умолчанию сначала новые, ascending=True - сначала старые.
+    """
+    keyset = True
+
+    def __init__(self, object_list, per_page, cursor=None, scope=None,
+                 date_field='pub_date', id_field='id', ascending=False):
+        order = '' if ascending else '-'
+        super().__init__(
+            object_list.order_by(f'{order}{date_field}', f'{order}{id_field}'),
+            per_page
+        )
+        self.cursor = decode_cursor(cursor) if cursor else None
+        self.scope = scope or Q()
+        self.date_field = date_field
+        self.id_field = id_field
+        self.date_attr = date_field.rsplit('__', 1)[-1]
+        self.ascending = ascending
+
+    def _after(self, pub_date, pk, lookup):
+        # scope и условие курсора в одном filter(), чтобы join не дублировался
+        tie = {self.date_field: pub_date, f'{self.id_field}__{lookup}': pk}
+        return self.scope & (
+            Q(**{f'{self.date_field}__{lookup}': pub_date}) | Q(**tie)
+        )
+
+    @property
+    def backwards(self):
+        return self.cursor is not None and self.cursor[0] == PREV
+
+    @cached_property
+    def _window(self):
+        if self.cursor is None:
+            queryset = self.object_list.filter(self.scope)
+        else:
+            _, pub_date, pk = self.cursor
+            forward, backward = ('gt', 'lt') if self.ascending else (
+                'lt', 'gt'
+            )
+            if self.backwards:
+                queryset = self.object_list.filter(
+                    self._after(pub_date, pk, backward)
+                ).reverse()
+            else:
+                queryset = self.object_list.filter(
+                    self._after(pub_date, pk, forward)
+                )
+        rows = list(queryset[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if self.backwards:
+            rows.reverse()
+        return rows, more
+
+    @property
+    def has_previous(self):
+        if self.cursor is None:
+            return False
+        return self._window[1] if self.backwards else True
+
+    @property
+    def has_next(self):
+        return True if self.backwards else self._window[1]
+
+    @property
+    def number(self):
+        return 2 if self.has_previous else 1
 
+    @property
+    def num_pages(self):
+        return self.number + 1 if self.has_next else self.number
 
-def pagin(request, post_list):
-    paginator = Paginator(post_list, settings.COUNTLIST)
+    @cached_property
+    def next_cursor(self):
+        rows = self._window[0]
+        if self.has_next and rows:
+            return encode_cursor(rows[-1], NEXT, self.date_attr)
+        return None
+
+    @cached_property
+    def previous_cursor(self):
+        rows = self._window[0]
+        if self.has_previous and rows:
+            return encode_cursor(rows[0], PREV, self.date_attr)
+        return None
+
+    def page(self, number=None):
+        return Page(
+            SimpleLazyObject(lambda: self._window[0]), self.number, self
+        )
+
+    get_page = page
+
+
+class WindowedPaginator(Paginator):
+    """Offset-пагинация, не растущая вместе с таблицей.
+
+    Точный COUNT(*) считается, только пока строк не больше
+    PAGINATOR_EXACT_COUNT; дальше берётся оценка estimate (например,
+    денормализованный счётчик) или итог, закэшированный под count_key
+    на PAGINATOR_COUNT_TIMEOUT. У страницы есть page_window - первая и
+    последняя страницы плюс соседи текущей, пропуски заменены ELLIPSIS.
+    """
+    ELLIPSIS = ELLIPSIS
+
+    def __init__(self, object_list, per_page, estimate=None, count_key=None,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.estimate = estimate
+        self.count_key = count_key
+        self.approximate = False
+
+    @cached_property
+    def count(self):
+        limit = settings.PAGINATOR_EXACT_COUNT
+        bounded = self.object_list.order_by()[:limit + 1].count()
+        if bounded <= limit:
+            return bounded
+        self.approximate = True
+        if self.estimate is not None:
+            return max(self.estimate, bounded)
+        if self.count_key is None:
+            return self.object_list.count()
+        return get_or_compute(
+            f'paginator_count:{self.count_key}', self.object_list.count,
+            settings.PAGINATOR_COUNT_TIMEOUT
+        )
+
+    def page_window(self, number, on_each_side=2, on_ends=1):
+        num_pages = self.num_pages
+        if num_pages <= (on_each_side + on_ends + 1) * 2:
+            return list(self.page_range)
+        window = []
+        if number > on_each_side + on_ends + 2:
+            window += [*range(1, on_ends + 1), ELLIPSIS]
+            window += range(number - on_each_side, number + 1)
+        else:
+            window += range(1, number + 1)
+        if number < num_pages - on_each_side - on_ends - 1:
+            window += range(number + 1, number + on_each_side + 1)
+            window.append(ELLIPSIS)
+            window += range(num_pages - on_ends + 1, num_pages + 1)
+        else:
+            window += range(number + 1, num_pages + 1)
+        return window
+
+    def page(self, number):
+        page = super().page(number)
+        page.page_window = self.page_window(page.number)
+        return page
+
+
+def pagin(request, post_list, estimate=None, count_key=None, **keyset):
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+    if page_number is not None:
+        date_field = keyset.get('date_field', 'pub_date')
+        id_field = keyset.get('id_field', 'id')
+        post_list = post_list.filter(keyset.get('scope') or Q()).order_by(
+            f'-{date_field}', f'-{id_field}'
+        )
+        paginator = WindowedPaginator(
+            post_list, settings.COUNTLIST, estimate, count_key
+        )
+        return paginator.get_page(page_number)
+    paginator = CursorPaginator(
+        post_list, settings.COUNTLIST, request.GET.get('cursor'), **keyset
+    )
+    return paginator.page()
+
+
+def pk_chunks(model, size):
+    """Отдаёт списки первичных ключей пачками, без OFFSET."""
+    last_pk = None
+    while True:
+        queryset = model.objects.order_by('pk')
+        if last_pk is not None:
+            queryset = queryset.filter(pk__gt=last_pk)
+        ids = list(queryset.values_list('pk', flat=True)[:size])
+        if not ids:
+            return
+        yield ids
+        last_pk = ids[-1]
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Отключает auto_now_add у полей, чтобы bulk_create сохранил даты.
+
+    Поля моделей общие для процесса: только для команд управления.
+    """
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
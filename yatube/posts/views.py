@@ -1,25 +1,66 @@
+import hashlib
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
-
+from django.utils.http import urlencode
+
+from core.decorators import page_cache, query_budget
+from . import follows
+from .caching import INDEX_FEED, feed_version, follow_feed
+from .conditional import (feed_condition, group_scopes, index_scopes,
+                          post_scopes, profile_scopes)
+from .counters import stats_for
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import pagin
+from .models import Group, Post, User
+from .search import search_posts
+from .timeline import feed_keyset
+from .utils import CursorPaginator, WindowedPaginator, pagin
 
 
+@page_cache
+@feed_condition(index_scopes)
+@query_budget(3)
 def index(request):
-    post_list = Post.objects.all().order_by('-pub_date')
-    page_obj = pagin(request, post_list)
+    page_obj = pagin(
+        request, Post.objects.select_related('author', 'group'),
+        count_key=INDEX_FEED
+    )
     context = {
         'page_obj': page_obj,
+        'feed_version': feed_version(INDEX_FEED),
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
     }
     return render(request, 'posts/index.html', context)
 
 
+@query_budget(4)
+def search(request):
+    query = request.GET.get('q', '').strip()
+    post_list = search_posts(
+        Post.objects.select_related('author', 'group'), query
+    )
+    paginator = WindowedPaginator(
+        post_list, settings.COUNTLIST,
+        count_key='search:' + hashlib.md5(query.encode()).hexdigest()
+    )
+    context = {
+        'query': query,
+        'page_obj': paginator.get_page(request.GET.get('page')),
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@page_cache
+@feed_condition(group_scopes)
+@query_budget(4)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = pagin(request, post_list)
+    post_list = group.posts.select_related('author', 'group')
+    page_obj = pagin(request, post_list, estimate=group.posts_count)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -27,36 +68,48 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@page_cache
+@feed_condition(profile_scopes, per_viewer=True)
+@query_budget(5)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    post_count = posts.count()
-    page_obj = pagin(request, posts)
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user, author=author
-        ).exists()
-    else:
-        following = False
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    posts = author.posts.select_related('author', 'group')
+    post_count = stats_for(author).posts_count
+    page_obj = pagin(request, posts, estimate=post_count)
     context = {
         'author': author,
         'post_count': post_count,
         'page_obj': page_obj,
-        'following': following
     }
     return render(request, 'posts/profile.html', context)
 
 
+@page_cache
+@feed_condition(post_scopes)
+@query_budget(2)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id
+    )
     author = post.author
-    comments = post.comments.all
+    newest_first = request.GET.get('order') == 'new'
+    comments = CursorPaginator(
+        post.comments.select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+        request.GET.get('cursor'),
+        date_field='created',
+        ascending=not newest_first,
+    ).page()
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
         'form': form,
         'author': author,
-        'comments': comments
+        'comments': comments,
+        'newest_first': newest_first,
+        'comments_query': 'order=new&' if newest_first else '',
     }
     return render(request, 'posts/post_detail.html', context)
 
@@ -70,7 +123,8 @@ def post_create(request, ):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        with transaction.atomic():
+            post.save()
         return redirect('posts:profile', post.author)
     context = {
         'form': form
@@ -88,7 +142,8 @@ def post_edit(request, post_id):
         files=request.FILES or None
     )
     if form.is_valid() and post.author == request.user:
-        post.save()
+        with transaction.atomic():
+            post.save()
         return redirect('posts:post_detail', post_id)
     context = {
         'form': form,
@@ -105,7 +160,8 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
         return redirect('posts:post_detail', post_id)
     context = {
         'form': form,
@@ -115,36 +171,35 @@ def add_comment(request, post_id):
 
 
 @login_required
+@query_budget(3)
 def follow_index(request):
-    posts_list = Post.objects.filter(
-        author__following__user=request.user
-    ).order_by('-pub_date')
+    page_obj = pagin(
+        request,
+        Post.objects.select_related('author', 'group'),
+        count_key=follow_feed(request.user.pk),
+        **feed_keyset(request.user)
+    )
     return render(
         request,
         'posts/follow.html',
         {
-            'page_obj': pagin(request, posts_list),
+            'page_obj': page_obj,
             'author': request.user,
+            'feed_version': feed_version(follow_feed(request.user.pk)),
+            'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
         }
     )
 
 
 @login_required
 def profile_follow(request, username):
-    user = request.user
-    author = get_object_or_404(User, username=username)
-    if user != author:
-        Follow.objects.get_or_create(
-            user=user,
-            author=author
-        )
+    with transaction.atomic():
+        follows.follow(request.user, username)
     return redirect(reverse('posts:profile', args=[username]))
 
 
 @login_required
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
-    is_follower = Follow.objects.filter(user=request.user, author=author)
-    if is_follower.exists():
-        is_follower.delete()
-    return redirect('posts:profile', username=author)
+    with transaction.atomic():
+        follows.unfollow(request.user, username)
+    return redirect('posts:profile', username=username)
@@ -10,7 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -28,6 +32,50 @@ DEBUG = True
 
 COUNTLIST = 10
 
+# Offset-пагинация (posts.utils.WindowedPaginator): до скольких строк
+# считать точный COUNT(*) и сколько секунд кэшировать итог сверх того
+PAGINATOR_EXACT_COUNT = 1000
+PAGINATOR_COUNT_TIMEOUT = 5 * 60
+
+# Комментариев на странице поста
+COMMENTS_PER_PAGE = 20
+
+# Время жизни фрагментного кэша лент (index, follow), секунды
+FEED_CACHE_TIMEOUT = 20
+
+# Полностраничный кэш гостей (core.middleware.PageCacheMiddleware):
+# срок для страниц, которые не сбрасываются по версиям лент, секунды
+PAGE_CACHE_TIMEOUT = 5 * 60
+
+# Защита от лавины пересчётов (core.stampede): блокировка пересчёта,
+# сколько хранить значение после срока, чтобы отдавать его во время
+# пересчёта, сколько ждать пересчёта без прежнего значения и
+# коэффициент вероятностного раннего пересчёта (0 - только по сроку)
+STAMPEDE_LOCK_TIMEOUT = 10
+STAMPEDE_STALE_TIMEOUT = 5 * 60
+STAMPEDE_WAIT = 2
+STAMPEDE_BETA = 1.0
+
+# Кэш подписок процесса (posts.following): всего id авторов в памяти
+# и наибольший список одного пользователя, который ещё кэшируется
+FOLLOWING_CACHE_MAX_IDS = 200_000
+FOLLOWING_CACHE_USER_LIMIT = 5_000
+
+# Время жизни HTML карточек постов (posts.templatetags.post_cards), секунды.
+# Правка поста, его автора или группы меняет ключ сама (posts.caching)
+POST_CARD_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Превышение бюджета запросов (core.decorators.query_budget):
+# False - предупреждение в лог, True - исключение
+QUERY_BUDGET_RAISE = False
+
+# Метрики производительности (core.middleware.PerformanceMiddleware).
+# METRICS_DIR - общий каталог снимков воркеров, None - только свой процесс;
+# METRICS_TOKEN - Bearer-токен /metrics/ (staff пускается всегда)
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = None
+
 ALLOWED_HOSTS = [
     'localhost',
     '127.0.0.1',
@@ -61,12 +109,38 @@ INSTALLED_APPS = [
     'sorl.thumbnail',
     'debug_toolbar',
 ]
+# общий для всех воркеров хоста кэш в SQLite (WAL) и перед ним
+# небольшой LRU в памяти каждого процесса, см. core.cache
+# Тесты (manage.py test, pytest) не видят кэш разработчика и прошлых
+# запусков: общий файл кэша у каждого запуска свой во временной папке
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+if TESTING:
+    TEST_CACHE_DIR = tempfile.mkdtemp(prefix='yatube-cache-')
+    atexit.register(shutil.rmtree, TEST_CACHE_DIR, ignore_errors=True)
+    SHARED_CACHE = os.path.join(TEST_CACHE_DIR, 'cache.sqlite3')
+else:
+    SHARED_CACHE = os.environ.get(
+        'YATUBE_CACHE', os.path.join(BASE_DIR, 'cache.sqlite3')
+    )
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TieredCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 5,
+            'SYNC_INTERVAL': 1,
+        },
+    },
+    'shared': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': SHARED_CACHE,
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
 }
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -75,6 +149,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.middleware.HoleMiddleware',
+    'core.middleware.PageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -104,9 +180,10 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# core.sqlite3 - SQLite, где atomic() начинается с BEGIN IMMEDIATE
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
     }
 }